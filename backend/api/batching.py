@@ -0,0 +1,27 @@
+import threading
+
+from django.db import transaction
+
+
+class CommitBatch:
+    """Копит id объектов до фиксации транзакции.
+
+    Первый сработавший после фиксации обработчик передаёт все
+    накопленные id в ``handler`` одним вызовом, остальные ничего
+    не делают.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.local = threading.local()
+
+    def add(self, pk, using):
+        if not hasattr(self.local, 'pending'):
+            self.local.pending = {}
+        self.local.pending.setdefault(using, set()).add(pk)
+        transaction.on_commit(lambda: self.flush(using), using=using)
+
+    def flush(self, using):
+        ids = self.local.pending.pop(using, None)
+        if ids:
+            self.handler(ids, using)
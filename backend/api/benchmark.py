@@ -0,0 +1,303 @@
+import base64
+import os
+import random
+import statistics
+import time
+import tracemalloc
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test.utils import override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.cart import rebuild_cart_ingredients
+from api.feed import backfill
+from api.metrics import RequestProfile, current_profile
+from api.search import update_search_vectors
+from api.similarity import rebuild_similar
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag, TagInRecipe)
+from users.models import Follower, User
+
+DEFAULT_INGREDIENTS_PATH = os.path.join(
+    os.path.dirname(settings.BASE_DIR), 'data', 'ingredients.csv')
+
+
+def png_base64(size=(64, 64), color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+class DatasetFactory:
+    """Заполняет базу синтетическими пользователями и рецептами.
+
+    Данные строятся из ``seed``, поэтому повторные прогоны сравнимы.
+    Счётчики, ленты, суммы корзин и индексы пересчитываются теми же
+    функциями, что и в работе приложения.
+    """
+
+    def __init__(self, users, recipes, ingredients_path, seed=0,
+                 favorites=20, carts=5, follows=10):
+        self.users = users
+        self.recipes = recipes
+        self.ingredients_path = ingredients_path
+        self.random = random.Random(seed)
+        self.favorites = favorites
+        self.carts = carts
+        self.follows = follows
+
+    def create(self):
+        call_command('load_ingredients', self.ingredients_path,
+                     stdout=StringIO())
+        call_command('load_tags', stdout=StringIO())
+        users = self.create_users()
+        recipes = self.create_recipes(users)
+        self.create_relations(users, recipes)
+        call_command('recount_counters', stdout=StringIO())
+        rebuild_cart_ingredients([user.id for user in users])
+        update_search_vectors(Recipe.objects.all())
+        rebuild_similar()
+        return users, recipes
+
+    def create_users(self):
+        User.objects.bulk_create(
+            User(
+                username=f'user{number}',
+                email=f'user{number}@benchmark.local',
+                first_name='Имя',
+                last_name='Фамилия',
+            )
+            for number in range(self.users)
+        )
+        return list(User.objects.order_by('id'))
+
+    def create_recipes(self, users):
+        image = Recipe._meta.get_field('image').upload_to + 'benchmark.png'
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=self.random.choice(users),
+                name=f'Рецепт {number}',
+                image=image,
+                text=f'Описание рецепта {number}',
+                cooking_time=self.random.randint(5, 120),
+            )
+            for number in range(self.recipes)
+        )
+        recipes = list(Recipe.objects.order_by('id'))
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe, ingredient_id=ingredient_id,
+                amount=self.random.randint(1, 500),
+            )
+            for recipe in recipes
+            for ingredient_id in self.random.sample(
+                ingredient_ids, self.random.randint(3, 10))
+        )
+        TagInRecipe.objects.bulk_create(
+            TagInRecipe(recipe=recipe, tag_id=tag_id)
+            for recipe in recipes
+            for tag_id in self.random.sample(
+                tag_ids, self.random.randint(1, len(tag_ids)))
+        )
+        return recipes
+
+    def create_relations(self, users, recipes):
+        listed = recipes[:-1]
+        for model, count in ((Favorite, self.favorites),
+                             (ShoppingCart, self.carts)):
+            model.objects.bulk_create(
+                model(user=user, recipe=recipe)
+                for user in users
+                for recipe in self.random.sample(
+                    listed, min(count, len(listed)))
+            )
+        authors = users[:-1]
+        follows = [
+            (user, author)
+            for user in users
+            for author in self.random.sample(
+                authors, min(self.follows, len(authors)))
+            if author != user
+        ]
+        Follower.objects.bulk_create(
+            Follower(user=user, following=author) for user, author in follows
+        )
+        for user, author in follows:
+            backfill(user, author)
+
+
+def scenarios(users, recipes):
+    """Запросы ко всем маршрутам ``api.urls``: (имя, метод, путь, тело).
+
+    Запросы идут от первого пользователя. Последний рецепт фабрика
+    не добавляет в избранное и корзины, а на последнего пользователя
+    никого не подписывает: они нужны для пишущих сценариев.
+
+    Пишущие сценарии идут парами, чтобы каждый повтор начинался
+    с того же состояния.
+    """
+    recipe = recipes[len(recipes) // 2]
+    free = recipes[-1]
+    author = users[1]
+    stranger = users[-1]
+    ingredient_ids = list(IngredientInRecipe.objects.filter(
+        recipe=recipe).values_list('ingredient_id', flat=True))
+    tag = Tag.objects.first()
+    payload = {
+        'name': 'Рецепт для замера',
+        'text': 'Описание',
+        'cooking_time': 10,
+        'image': png_base64(),
+        'tags': [tag.id],
+        'ingredients': [
+            {'id': pk, 'amount': 10} for pk in ingredient_ids[:5]
+        ],
+    }
+    return [
+        ('recipes:list', 'get', '/api/recipes/', None),
+        ('recipes:list:tags', 'get', f'/api/recipes/?tags={tag.slug}', None),
+        ('recipes:list:author', 'get',
+         f'/api/recipes/?author={author.id}', None),
+        ('recipes:list:favorited', 'get',
+         '/api/recipes/?is_favorited=1', None),
+        ('recipes:list:popular', 'get',
+         '/api/recipes/?ordering=popular', None),
+        ('recipes:list:cursor', 'get',
+         '/api/recipes/?pagination=cursor', None),
+        ('recipes:list:search', 'get', '/api/recipes/?search=рецепт', None),
+        ('recipes:detail', 'get', f'/api/recipes/{recipe.id}/', None),
+        ('recipes:similar', 'get', f'/api/recipes/{recipe.id}/similar/',
+         None),
+        ('recipes:by_ingredients', 'get',
+         f'/api/recipes/by_ingredients/?pantry={ingredient_ids[0]}'
+         f'&max_missing=5', None),
+        ('recipes:feed', 'get', '/api/recipes/feed/', None),
+        ('recipes:create', 'post', '/api/recipes/', payload),
+        ('recipes:update', 'patch', '/api/recipes/{created}/',
+         {'name': 'Рецепт для замера 2', 'ingredients': [
+             {'id': pk, 'amount': 20} for pk in ingredient_ids[:5]
+         ]}),
+        ('recipes:delete', 'delete', '/api/recipes/{created}/', None),
+        ('favorite:add', 'post', f'/api/recipes/{free.id}/favorite/',
+         None),
+        ('favorite:remove', 'delete',
+         f'/api/recipes/{free.id}/favorite/', None),
+        ('cart:add', 'post', f'/api/recipes/{free.id}/shopping_cart/',
+         None),
+        ('cart:preview', 'get', '/api/recipes/shopping_cart/', None),
+        ('cart:download', 'get',
+         '/api/recipes/download_shopping_cart/?format=txt', None),
+        ('cart:remove', 'delete',
+         f'/api/recipes/{free.id}/shopping_cart/', None),
+        ('subscriptions:list', 'get',
+         '/api/users/subscriptions/?recipes_limit=3', None),
+        ('subscribe:add', 'post', f'/api/users/{stranger.id}/subscribe/',
+         None),
+        ('subscribe:remove', 'delete',
+         f'/api/users/{stranger.id}/subscribe/', None),
+        ('users:list', 'get', '/api/users/', None),
+        ('users:me', 'get', '/api/users/me/', None),
+        ('tags:list', 'get', '/api/tags/', None),
+        ('ingredients:search', 'get', '/api/ingredients/?name=мол', None),
+    ]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Benchmark:
+    """Прогоняет сценарии и собирает число запросов к базе, p50/p95
+    времени ответа и пик выделенной памяти по каждому маршруту.
+
+    Запросы считает профиль в контекстной переменной, а не
+    ``CaptureQueriesContext``: так учитываются и запросы из рабочих
+    потоков ``sync_to_async``. Профилирование в middleware на время
+    прогона выключено, иначе его профиль заслонил бы этот.
+    """
+
+    def __init__(self, user, repeat):
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client = APIClient(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.repeat = repeat
+
+    def request(self, method, path, data, context):
+        path = path.format(**context)
+        response = getattr(self.client, method)(path, data, format='json')
+        if response.status_code >= 400:
+            raise AssertionError(
+                f'{method.upper()} {path}: {response.status_code}')
+        if getattr(response, 'streaming', False):
+            b''.join(response.streaming_content)
+        if method == 'post' and path == '/api/recipes/':
+            context['created'] = response.data['id']
+        return response
+
+    def count_queries(self, method, path, data, context):
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        try:
+            self.request(method, path, data, context)
+        finally:
+            current_profile.reset(token)
+        return profile.queries
+
+    @override_settings(API_METRICS_ENABLED=False)
+    def run(self, cases):
+        results = {}
+        timings = {name: [] for name, *_ in cases}
+        queries = {}
+        context = {}
+        for _ in range(self.repeat):
+            for name, method, path, data in cases:
+                started = time.perf_counter()
+                queries[name] = self.count_queries(method, path, data, context)
+                timings[name].append(time.perf_counter() - started)
+        memory = {}
+        for name, method, path, data in cases:
+            tracemalloc.start()
+            try:
+                self.request(method, path, data, context)
+                memory[name] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        for name, *_ in cases:
+            results[name] = {
+                'queries': queries[name],
+                'p50_ms': round(statistics.median(timings[name]) * 1000, 2),
+                'p95_ms': round(percentile(timings[name], 0.95) * 1000, 2),
+                'peak_kb': round(memory[name] / 1024, 1),
+            }
+        return results
+
+
+def compare(results, baseline, tolerance):
+    """Возвращает список регрессий относительно сохранённых замеров.
+
+    Число запросов сравнивается точно, время и память — с допуском
+    ``tolerance`` (доля от базового значения).
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(
+                f'{name}: запросов {current["queries"]} '
+                f'вместо {previous["queries"]}')
+        for metric in ('p95_ms', 'peak_kb'):
+            limit = previous[metric] * (1 + tolerance)
+            if current[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {current[metric]} '
+                    f'больше {previous[metric]}')
+    return regressions
@@ -0,0 +1,147 @@
+import hashlib
+import threading
+from collections import Counter
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.response import Response
+
+from api.batching import CommitBatch
+
+VERSION_KEY = 'api:version:{}'
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def is_process_local(alias):
+    """Кэш виден только процессу, который в него записал."""
+    return settings.CACHES[alias]['BACKEND'] in PROCESS_LOCAL_CACHES
+
+
+def new_version():
+    return uuid4().hex
+
+
+def bump_version(scope):
+    """Ставит области новую версию.
+
+    Версия — случайная метка без срока хранения, а не счётчик: ``incr``
+    в ``DatabaseCache`` перезаписывает ключ со сроком по умолчанию, и
+    после истечения счётчик вернулся бы к значению, под которым уже
+    лежат устаревшие ответы.
+    """
+    get_cache().set(VERSION_KEY.format(scope), new_version(), None)
+
+
+def bump_versions(scopes, using=None):
+    get_cache().set_many(
+        {VERSION_KEY.format(scope): new_version() for scope in scopes}, None)
+
+
+# Версии меняются после фиксации: иначе параллельный запрос успел бы
+# закэшировать старые данные уже под новой версией.
+version_bumps = CommitBatch(bump_versions)
+
+
+def invalidate_resource(resource):
+    """Сбрасывает все ответы ресурса: и списки, и карточки."""
+    version_bumps.add(resource, DEFAULT_DB_ALIAS)
+
+
+def invalidate_object(resource, pk):
+    """Сбрасывает списки ресурса и карточку одного объекта."""
+    version_bumps.add(f'{resource}:list', DEFAULT_DB_ALIAS)
+    version_bumps.add(f'{resource}:{pk}', DEFAULT_DB_ALIAS)
+
+
+def get_versions(scopes):
+    """Версии областей через точку.
+
+    Отсутствующие версии, в том числе вытесненные из кэша, получают
+    новую метку, поэтому прежние записи не читаются снова.
+    """
+    cache = get_cache()
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return '.'.join(versions[key] for key in keys)
+
+
+def normalize_query(query_params):
+    return urlencode(sorted(
+        (name, value)
+        for name in query_params
+        for value in sorted(set(query_params.getlist(name)))
+    ))
+
+
+def record(resource, result):
+    with _stats_lock:
+        _stats[(resource, result)] += 1
+
+
+def get_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+class CachedResponseMixin:
+    """Кэширует ответы list/retrieve для анонимных пользователей.
+
+    Ключ строится из версии ресурса, пути и отсортированных параметров
+    запроса. Сигналы из ``api.signals`` увеличивают версию, и старые
+    записи просто перестают читаться.
+    """
+    cache_resource = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().list, (self.cache_resource, f'{self.cache_resource}:list'),
+            request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        return self.cached_response(
+            super().retrieve,
+            (self.cache_resource, f'{self.cache_resource}:{lookup}'),
+            request, *args, **kwargs
+        )
+
+    def get_cache_key(self, request, scopes):
+        raw = '|'.join((
+            get_versions(scopes),
+            request.path,
+            normalize_query(request.query_params),
+            request.accepted_renderer.format,
+        ))
+        digest = hashlib.md5(raw.encode()).hexdigest()
+        return f'api:response:{self.cache_resource}:{digest}'
+
+    def cached_response(self, handler, scopes, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return handler(request, *args, **kwargs)
+        cache = get_cache()
+        key = self.get_cache_key(request, scopes)
+        data = cache.get(key)
+        if data is not None:
+            record(self.cache_resource, 'hit')
+            return Response(data, headers={'X-Cache': 'HIT'})
+        record(self.cache_resource, 'miss')
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
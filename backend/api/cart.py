@@ -0,0 +1,104 @@
+from django.db import connections, transaction
+from django.db.models import F
+
+from api.batching import CommitBatch
+from recipes.models import CartIngredient, IngredientInRecipe, ShoppingCart
+
+CART_TOTALS_SQL = (
+    'SELECT cart.user_id, item.ingredient_id, '
+    'SUM(item.amount * cart.servings) * %s '
+    'FROM {cart} AS cart JOIN {items} AS item '
+    'ON item.recipe_id = cart.recipe_id '
+    'WHERE cart.user_id IN ({users}){recipes} '
+    'GROUP BY cart.user_id, item.ingredient_id'
+)
+APPLY_DELTA_SQL = (
+    'INSERT INTO {totals} (user_id, ingredient_id, amount) {select} '
+    'ON CONFLICT (user_id, ingredient_id) '
+    'DO UPDATE SET amount = {totals}.amount + excluded.amount'
+)
+INSERT_TOTALS_SQL = (
+    'INSERT INTO {totals} (user_id, ingredient_id, amount) {select}'
+)
+
+
+def cart_totals_sql(connection, user_ids, recipe_ids, factor):
+    quote = connection.ops.quote_name
+    recipes = ''
+    params = [factor, *user_ids]
+    if recipe_ids is not None:
+        recipes = ' AND cart.recipe_id IN ({})'.format(
+            ', '.join(['%s'] * len(recipe_ids)))
+        params.extend(recipe_ids)
+    sql = CART_TOTALS_SQL.format(
+        cart=quote(ShoppingCart._meta.db_table),
+        items=quote(IngredientInRecipe._meta.db_table),
+        users=', '.join(['%s'] * len(user_ids)),
+        recipes=recipes,
+    )
+    return sql, params
+
+
+def apply_cart_delta(user_id, recipe_ids, factor, using='default'):
+    """Прибавляет к сумме корзины ингредиенты рецептов, умноженные на
+    число порций и ``factor``.
+
+    Вызывается с ``factor=1`` после добавления рецептов в корзину
+    и с ``factor=-1`` перед их удалением.
+    """
+    connection = connections[using]
+    select, params = cart_totals_sql(
+        connection, [user_id], list(recipe_ids), factor)
+    with connection.cursor() as cursor:
+        cursor.execute(APPLY_DELTA_SQL.format(
+            totals=connection.ops.quote_name(CartIngredient._meta.db_table),
+            select=select,
+        ), params)
+    if factor < 0:
+        CartIngredient.objects.using(using).filter(
+            user_id=user_id, amount__lte=0).delete()
+
+
+def rebuild_cart_ingredients(user_ids, using='default'):
+    """Пересобирает суммы корзин пользователей целиком."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    connection = connections[using]
+    select, params = cart_totals_sql(connection, user_ids, None, 1)
+    with transaction.atomic(using=using):
+        CartIngredient.objects.using(using).filter(
+            user_id__in=user_ids).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(INSERT_TOTALS_SQL.format(
+                totals=connection.ops.quote_name(
+                    CartIngredient._meta.db_table),
+                select=select,
+            ), params)
+
+
+def rebuild_recipe_carts(recipe_ids, using):
+    rebuild_cart_ingredients(
+        ShoppingCart.objects.using(using).filter(
+            recipe_id__in=recipe_ids
+        ).values_list('user_id', flat=True).distinct(),
+        using,
+    )
+
+
+recipe_cart_rebuilds = CommitBatch(rebuild_recipe_carts)
+
+
+def shopping_list_rows(user):
+    """Строки списка покупок для выгрузки, по алфавиту."""
+    return CartIngredient.objects.filter(
+        user=user
+    ).order_by(
+        'ingredient__name'
+    ).annotate(
+        sum_amount=F('amount')
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'sum_amount',
+    )
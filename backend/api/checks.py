@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from api.cache import is_process_local
+
+SHARED_CACHE_ERROR = (
+    'Кэш API "{}" хранится в памяти процесса: сброс версий, сделанный '
+    'в одном воркере, не дойдёт до остальных'
+)
+SHARED_CACHE_HINT = (
+    'Укажите общий для воркеров CACHE_BACKEND (DatabaseCache, '
+    'memcached) или, если приложение гарантированно работает в одном '
+    'процессе, добавьте "api.E001" в SILENCED_SYSTEM_CHECKS.'
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    alias = settings.API_CACHE_ALIAS
+    if not is_process_local(alias):
+        return []
+    return [Error(
+        SHARED_CACHE_ERROR.format(alias),
+        hint=SHARED_CACHE_HINT,
+        id='api.E001',
+    )]
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from api.batching import CommitBatch
+from api.feed import rebuild_author_feeds
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follower, User
+
+COUNTER_FIELDS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'carts_count',
+}
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет счётчик одним UPDATE, не опуская его ниже нуля."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, Value(0))}
+    )
+
+
+def actual_count(related, related_field):
+    """Число строк ``related``, ссылающихся на строку внешнего запроса."""
+    return Coalesce(
+        Subquery(
+            related.objects.filter(
+                **{related_field: OuterRef('pk')}
+            ).order_by().values(related_field).annotate(
+                count=Count('pk')
+            ).values('count'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount_counter(model, pks, field, related, related_field):
+    """Пересчитывает счётчик по связанным строкам одним UPDATE.
+
+    Используется после массовых изменений, когда точное число
+    добавленных и удалённых строк заранее неизвестно. ``pks`` — список
+    или подзапрос; возвращает число обновлённых строк.
+    """
+    return model.objects.filter(pk__in=pks).update(
+        **{field: actual_count(related, related_field)}
+    )
+
+
+def recount_recipe_counters(recipe_ids, using='default'):
+    """Пересчитывает счётчики избранного и корзин рецептов."""
+    with transaction.atomic(using=using):
+        for model, field in COUNTER_FIELDS.items():
+            recount_counter(Recipe, recipe_ids, field, model, 'recipe')
+
+
+def recount_recipes_count(author_ids, using='default'):
+    recount_counter(User, author_ids, 'recipes_count', Recipe, 'author')
+
+
+def recount_followers_count(author_ids, using='default'):
+    """Пересчитывает подписчиков и перестраивает ленты авторов, которые
+    при этом пересекли порог раскладки."""
+    threshold = settings.FEED_FANOUT_MAX_FOLLOWERS
+    authors = User.objects.filter(pk__in=author_ids)
+    with transaction.atomic(using=using):
+        before = dict(authors.values_list('pk', 'followers_count'))
+        recount_counter(
+            User, author_ids, 'followers_count', Follower, 'following')
+        for pk, count in authors.values_list('pk', 'followers_count'):
+            if (count > threshold) != (before[pk] > threshold):
+                rebuild_author_feeds(pk)
+
+
+# Каскадные удаления не вызывают сигналов для удаляемых строк, поэтому
+# затронутые счётчики пересчитываются после фиксации транзакции.
+recipe_counter_recounts = CommitBatch(recount_recipe_counters)
+recipes_count_recounts = CommitBatch(recount_recipes_count)
+followers_count_recounts = CommitBatch(recount_followers_count)
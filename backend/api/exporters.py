@@ -0,0 +1,182 @@
+import csv
+import json
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+EXPORT_SPOOL_SIZE = 1024 * 1024
+SHOPPING_CART_TITLE = 'Список покупок'
+SHOPPING_CART_HEADER = ('Ингредиент', 'Количество', 'Единица измерения')
+CSV_BOM = '\ufeff'
+
+SHOPPING_CART_RENDERERS = []
+
+
+def register_renderer(renderer_class):
+    """Добавляет формат выгрузки списка покупок в реестр."""
+    SHOPPING_CART_RENDERERS.append(renderer_class)
+    return renderer_class
+
+
+def chunked(parts, size=EXPORT_CHUNK_SIZE):
+    """Склеивает мелкие строки в блоки, чтобы не писать в сокет по строке."""
+    buffer, length = [], 0
+    for part in parts:
+        buffer.append(part)
+        length += len(part)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def export_to_file(renderer, ingredients):
+    """Записывает выгрузку во временный файл и перематывает его.
+
+    Небольшие списки остаются в памяти, крупные сбрасываются на диск.
+    """
+    file = SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    for chunk in renderer.stream(ingredients):
+        file.write(chunk)
+    file.seek(0)
+    return file
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    """Базовый класс выгрузки списка покупок.
+
+    Наследники реализуют ``lines``, получающий итератор строк
+    агрегированного запроса, и выдают файл по частям.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    def lines(self, ingredients):
+        raise NotImplementedError
+
+    def get_content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+    def stream(self, ingredients):
+        for chunk in chunked(self.lines(ingredients)):
+            yield chunk.encode(self.charset)
+
+
+@register_renderer
+class TextShoppingCartRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def lines(self, ingredients):
+        for ingredient in ingredients:
+            yield (
+                f'{ingredient["ingredient__name"]} - '
+                f'{ingredient["sum_amount"]}'
+                f'{ingredient["ingredient__measurement_unit"]}\n'
+            )
+
+
+@register_renderer
+class CSVShoppingCartRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def lines(self, ingredients):
+        writer = csv.writer(Echo())
+        yield CSV_BOM
+        yield writer.writerow(SHOPPING_CART_HEADER)
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['ingredient__name'],
+                ingredient['sum_amount'],
+                ingredient['ingredient__measurement_unit'],
+            ))
+
+
+@register_renderer
+class JSONShoppingCartRenderer(ShoppingCartRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def lines(self, ingredients):
+        separator = '['
+        for ingredient in ingredients:
+            yield separator + json.dumps({
+                'name': ingredient['ingredient__name'],
+                'amount': ingredient['sum_amount'],
+                'measurement_unit': ingredient['ingredient__measurement_unit'],
+            }, ensure_ascii=False)
+            separator = ',\n'
+        yield ']\n' if separator != '[' else '[]\n'
+
+
+@register_renderer
+class PDFShoppingCartRenderer(ShoppingCartRenderer):
+    """PDF собирается во временный файл и отдаётся из него блоками.
+
+    В отличие от остальных форматов память здесь не ограничена
+    размером блока: ``canvas.Canvas`` держит все страницы до ``save()``
+    и только тогда пишет документ в файл. Расход растёт с длиной
+    списка — около 200 байт на строку сверх нескольких мегабайт самой
+    reportlab.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_name = 'ShoppingCartFont'
+    font_size = 12
+    margin = 50
+
+    def get_font(self):
+        font_path = getattr(settings, 'SHOPPING_CART_PDF_FONT', None)
+        if not font_path:
+            return 'Helvetica'
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            try:
+                pdfmetrics.registerFont(TTFont(self.font_name, font_path))
+            except Exception:
+                return 'Helvetica'
+        return self.font_name
+
+    def stream(self, ingredients):
+        with SpooledTemporaryFile(max_size=EXPORT_CHUNK_SIZE) as file:
+            font = self.get_font()
+            pdf = canvas.Canvas(file, pagesize=A4)
+            width, height = A4
+            line_height = self.font_size * 1.5
+            pdf.setTitle(SHOPPING_CART_TITLE)
+            pdf.setFont(font, self.font_size)
+            y = height - self.margin
+            for ingredient in ingredients:
+                if y < self.margin:
+                    pdf.showPage()
+                    pdf.setFont(font, self.font_size)
+                    y = height - self.margin
+                pdf.drawString(
+                    self.margin, y,
+                    f'{ingredient["ingredient__name"]} - '
+                    f'{ingredient["sum_amount"]} '
+                    f'{ingredient["ingredient__measurement_unit"]}'
+                )
+                y -= line_height
+            pdf.save()
+            file.seek(0)
+            yield from iter(lambda: file.read(EXPORT_CHUNK_SIZE), b'')
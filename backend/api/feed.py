@@ -0,0 +1,114 @@
+from django.conf import settings
+
+from recipes.models import Recipe, TimelineEntry
+from users.models import Follower, User
+
+
+def is_fanned_out(author):
+    return author.followers_count <= settings.FEED_FANOUT_MAX_FOLLOWERS
+
+
+def fan_out(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора.
+
+    Рецепты авторов с большим числом подписчиков не копируются,
+    а подмешиваются в ленту при чтении.
+    """
+    if not is_fanned_out(recipe.author):
+        return
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id, recipe=recipe, pub_date=recipe.pub_date)
+            for user_id in Follower.objects.filter(
+                following_id=recipe.author_id
+            ).values_list('user_id', flat=True).iterator()
+        ),
+        batch_size=settings.FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def latest_recipes(author_id):
+    return Recipe.objects.filter(
+        author_id=author_id
+    ).order_by('-pub_date', '-id').values_list(
+        'id', 'pub_date'
+    )[:settings.FEED_BACKFILL_LIMIT]
+
+
+def backfill(user, author):
+    """Добавляет в ленту последние рецепты нового автора."""
+    if not is_fanned_out(author):
+        return
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user=user, recipe_id=recipe_id, pub_date=pub_date)
+            for recipe_id, pub_date in latest_recipes(author.id)
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def rebuild_author_feeds(author_id):
+    """Приводит ленты подписчиков к текущему режиму автора.
+
+    Раскладываемый автор получает свои последние рецепты в ленту каждого
+    подписчика, в том числе подписавшегося, пока рецепты читались при
+    чтении ленты. У остальных авторов записи удаляются: их рецепты
+    подмешивает ``feed_sources``.
+    """
+    author = User.objects.only('followers_count').get(pk=author_id)
+    if not is_fanned_out(author):
+        TimelineEntry.objects.filter(recipe__author_id=author_id).delete()
+        return
+    latest = list(latest_recipes(author_id))
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+            for user_id in Follower.objects.filter(
+                following_id=author_id
+            ).values_list('user_id', flat=True).iterator()
+            for recipe_id, pub_date in latest
+        ),
+        batch_size=settings.FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def followers_changed(author_id, delta):
+    """Перестраивает ленты, если подписка или отписка перевела автора
+    через порог раскладки.
+
+    Вызывается в транзакции сразу после изменения ``followers_count``:
+    строка автора заблокирована этим UPDATE, поэтому порог пересекает
+    ровно одна из параллельных подписок. Возвращает новое значение
+    счётчика.
+    """
+    count = User.objects.filter(pk=author_id).values_list(
+        'followers_count', flat=True).get()
+    threshold = settings.FEED_FANOUT_MAX_FOLLOWERS
+    if count == (threshold + 1 if delta > 0 else threshold):
+        rebuild_author_feeds(author_id)
+    return count
+
+
+def remove_author(user, author_id):
+    TimelineEntry.objects.filter(
+        user=user, recipe__author_id=author_id).delete()
+
+
+def feed_sources(user):
+    """Источники ленты: записи пользователя и рецепты авторов, которые
+    читаются без раскладки по лентам."""
+    sources = [
+        (TimelineEntry.objects.filter(user=user), 'recipe_id'),
+    ]
+    pulled = list(Follower.objects.filter(
+        user=user,
+        following__followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).values_list('following_id', flat=True))
+    if pulled:
+        sources.append((Recipe.objects.filter(author__in=pulled), 'id'))
+    return sources
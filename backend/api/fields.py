@@ -0,0 +1,118 @@
+import binascii
+from base64 import b64decode
+from tempfile import SpooledTemporaryFile
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
+from rest_framework.serializers import ImageField, ReadOnlyField
+
+BASE64_CHUNK_SIZE = 64 * 1024
+BASE64_MARKER = ';base64,'
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+IMAGE_INVALID_ERROR = 'Загрузите корректное изображение'
+IMAGE_SIZE_ERROR = 'Размер изображения больше {max_size} байт'
+IMAGE_PIXELS_ERROR = 'Изображение больше {max_pixels} пикселей'
+
+
+class RecipeImageField(ReadOnlyField):
+    """Ссылка на вариант изображения рецепта, пока его нет — на оригинал."""
+
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        image = getattr(recipe, self.variant) or recipe.image
+        if not image:
+            return None
+        request = self.context.get('request')
+        if request is None:
+            return image.url
+        return request.build_absolute_uri(image.url)
+
+
+class RecipeImageUploadField(ImageField):
+    """Изображение рецепта: файл из multipart или строка base64.
+
+    Base64 декодируется блоками во временный файл, который уходит на
+    диск после ``FILE_UPLOAD_MAX_MEMORY_SIZE``. Размер проверяется по
+    мере декодирования, число пикселей — по заголовку изображения до
+    чтения самих пикселей.
+    """
+    default_error_messages = {
+        'invalid_image': IMAGE_INVALID_ERROR,
+        'max_size': IMAGE_SIZE_ERROR,
+        'max_pixels': IMAGE_PIXELS_ERROR,
+    }
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('use_url', False)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            file = self.decode_base64(data)
+        elif isinstance(data, UploadedFile):
+            self.check_size(data.size)
+            file = data
+        else:
+            self.fail('invalid_image')
+        file.name = f'{uuid4()}.{self.check_image(file)}'
+        return file
+
+    def check_size(self, size):
+        if size > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.fail('max_size', max_size=settings.RECIPE_IMAGE_MAX_SIZE)
+
+    def decode_base64(self, data):
+        marker = data.find(BASE64_MARKER)
+        position = 0 if marker < 0 else marker + len(BASE64_MARKER)
+        file = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        # Строка не копируется целиком: пробелы и переносы, допустимые в
+        # base64, но отвергаемые ``validate``, убираются в каждом блоке,
+        # а неполная четвёрка символов переносится в следующий.
+        rest = ''
+        size = 0
+        try:
+            while position < len(data):
+                chunk = rest + ''.join(
+                    data[position:position + BASE64_CHUNK_SIZE].split())
+                position += BASE64_CHUNK_SIZE
+                end = len(chunk) - len(chunk) % 4
+                rest = chunk[end:]
+                size += file.write(b64decode(chunk[:end], validate=True))
+                if size > settings.RECIPE_IMAGE_MAX_SIZE:
+                    file.close()
+                    self.check_size(size)
+            if rest:
+                raise binascii.Error('Incorrect padding')
+        except (binascii.Error, ValueError):
+            file.close()
+            self.fail('invalid_image')
+        file.seek(0)
+        return File(file)
+
+    def check_image(self, file):
+        """Проверяет формат и размеры, возвращает расширение файла."""
+        max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+                if width * height > max_pixels:
+                    self.fail('max_pixels', max_pixels=max_pixels)
+                image.verify()
+                extension = IMAGE_FORMATS.get(image.format)
+        except Image.DecompressionBombError:
+            self.fail('max_pixels', max_pixels=max_pixels)
+        except (OSError, SyntaxError, ValueError):
+            self.fail('invalid_image')
+        if extension is None:
+            self.fail('invalid_image')
+        file.seek(0)
+        return extension
@@ -2,6 +2,22 @@ from django_filters import ModelMultipleChoiceFilter
 from django_filters.rest_framework import FilterSet, filters
 from recipes.models import Ingredient, Recipe, Tag
 
+from api.search import search_recipes
+
+
+ORDERING_CHOICES = (
+    ('newest', 'Сначала новые'),
+    ('popular', 'Больше всего в избранном'),
+    ('trending', 'Популярные за неделю'),
+    ('cooking_time', 'Быстрые в приготовлении'),
+)
+ORDERING_FIELDS = {
+    'newest': ('-pub_date', '-id'),
+    'popular': ('-favorites_count', '-pub_date', '-id'),
+    'trending': ('-popularity_score', '-pub_date', '-id'),
+    'cooking_time': ('cooking_time', '-pub_date', '-id'),
+}
+
 
 class RecipeFilter(FilterSet):
     tags = ModelMultipleChoiceFilter(
@@ -13,10 +29,16 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=ORDERING_CHOICES,
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'search', 'ordering')
 
     def filter_is_favorited(self, queryset, name, value):
         if not value:
@@ -28,6 +50,12 @@ class RecipeFilter(FilterSet):
             return queryset
         return queryset.filter(carts__user=self.request.user)
 
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*ORDERING_FIELDS[value])
+
 
 class IngredientFilter(FilterSet):
     name = filters.CharFilter(field_name='name', method='start_name')
@@ -37,4 +65,4 @@ class IngredientFilter(FilterSet):
         fields = ('name',)
 
     def start_name(self, queryset, slug, name):
-        return queryset.filter(name__startswith=name)
+        return queryset.filter(name__istartswith=name)
@@ -0,0 +1,122 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps
+
+from api.cache import invalidate_object
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.IMAGE_PROCESSING_WORKERS,
+        thread_name_prefix='recipe-images',
+    )
+
+
+def render_variant(image, max_size):
+    """Уменьшает копию изображения и кодирует её в WebP."""
+    variant = image.copy()
+    variant.thumbnail(max_size, Image.LANCZOS)
+    buffer = BytesIO()
+    variant.save(
+        buffer, 'WEBP', quality=settings.RECIPE_IMAGE_WEBP_QUALITY
+    )
+    return buffer.getvalue()
+
+
+def process_recipe_image(recipe_id):
+    """Строит миниатюру и WebP-версию изображения рецепта.
+
+    Варианты записываются через ``update`` только если изображение
+    не успели заменить, пока шла обработка.
+    """
+    recipe = Recipe.objects.filter(id=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return
+    source = recipe.image.name
+    with recipe.image.open('rb') as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.mode else 'RGB')
+        thumbnail = render_variant(image, settings.RECIPE_THUMBNAIL_SIZE)
+        webp = render_variant(image, settings.RECIPE_IMAGE_WEBP_SIZE)
+    name = os.path.splitext(os.path.basename(source))[0]
+    storage = recipe.image.storage
+    thumbnail_name = storage.save(
+        f'recipes/thumbnails/{name}.webp', ContentFile(thumbnail))
+    webp_name = storage.save(f'recipes/webp/{name}.webp', ContentFile(webp))
+    updated = Recipe.objects.filter(id=recipe_id, image=source).update(
+        thumbnail=thumbnail_name, image_webp=webp_name)
+    if not updated:
+        storage.delete(thumbnail_name)
+        storage.delete(webp_name)
+        return
+    invalidate_object('recipes', recipe_id)
+
+
+def reset_variants(recipe):
+    """Сбрасывает варианты старого изображения перед заменой.
+
+    Пока новые варианты не готовы, отдаётся оригинал; файлы старых
+    удаляются после фиксации транзакции.
+    """
+    stale = [
+        variant.name for variant in (recipe.thumbnail, recipe.image_webp)
+        if variant
+    ]
+    recipe.thumbnail = ''
+    recipe.image_webp = ''
+    storage = recipe.image.storage
+
+    def delete_stale():
+        for name in stale:
+            storage.delete(name)
+    transaction.on_commit(delete_stale)
+
+
+def run_sync(recipe_id):
+    try:
+        process_recipe_image(recipe_id)
+    except Exception:
+        logger.exception(
+            'Не удалось обработать изображение рецепта %s', recipe_id)
+
+
+def run_in_thread(recipe_id):
+    def task():
+        try:
+            run_sync(recipe_id)
+        finally:
+            connection.close()
+    get_executor().submit(task)
+
+
+def get_backend():
+    backend = settings.IMAGE_PROCESSING_BACKEND
+    if backend == 'sync':
+        return run_sync
+    if backend == 'thread':
+        return run_in_thread
+    return import_string(backend)
+
+
+def schedule_image_processing(recipe_id):
+    """Ставит обработку изображения в очередь после фиксации транзакции.
+
+    ``IMAGE_PROCESSING_BACKEND`` выбирает исполнителя: ``thread`` — пул
+    потоков процесса, ``sync`` — сразу в запросе, либо путь до функции,
+    которая отправит ``recipe_id`` во внешнюю очередь задач.
+    """
+    backend = get_backend()
+    transaction.on_commit(lambda: backend(recipe_id))
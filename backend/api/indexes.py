@@ -0,0 +1,187 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import chain, groupby
+from operator import itemgetter
+
+from django.conf import settings
+
+from api.cache import bump_version, get_versions
+from foodgram.db.router import use_primary
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+
+
+def normalize(value):
+    """Приводит строку к виду для поиска без учёта регистра и буквы ё."""
+    return value.casefold().replace('ё', 'е').strip()
+
+
+class LazyIndex:
+    """Индекс в памяти процесса, который строится при первом обращении.
+
+    Сброс увеличивает версию индекса в общем кэше API. Остальные
+    процессы сверяют её не чаще раза в ``INDEX_VERSION_CHECK_INTERVAL``
+    секунд и перестраивают индекс, если версия изменилась; ``ttl``
+    ограничивает возраст индекса, если версию не увеличили.
+    """
+    ttl_setting = None
+    version_scope = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._built_at = 0
+        self._checked_at = 0
+        self._version = None
+        self._generation = 0
+
+    def build(self):
+        raise NotImplementedError
+
+    def invalidate(self, **kwargs):
+        with self._lock:
+            self._generation += 1
+            self._data = None
+        bump_version(self.version_scope)
+
+    def get_version(self):
+        return get_versions((self.version_scope,))
+
+    def is_expired(self):
+        ttl = getattr(settings, self.ttl_setting, None)
+        return bool(ttl) and time.monotonic() - self._built_at > ttl
+
+    def is_stale(self):
+        if self.is_expired():
+            return True
+        now = time.monotonic()
+        if now - self._checked_at < settings.INDEX_VERSION_CHECK_INTERVAL:
+            return False
+        self._checked_at = now
+        return self.get_version() != self._version
+
+    @property
+    def data(self):
+        data = self._data
+        if data is not None and not self.is_stale():
+            return data
+        generation = self._generation
+        version = self.get_version()
+        with use_primary():
+            data = self.build()
+        with self._lock:
+            if generation == self._generation:
+                self._data = data
+                self._version = version
+                self._built_at = self._checked_at = time.monotonic()
+        return data
+
+
+class IngredientIndex(LazyIndex):
+    """Отсортированный по нормализованному названию список ингредиентов.
+
+    Сначала бинарным поиском выбираются совпадения по началу названия,
+    затем, если лимит не набран, совпадения по подстроке.
+    """
+    ttl_setting = 'INGREDIENT_INDEX_TTL'
+    version_scope = 'index:ingredients'
+
+    def build(self):
+        entries = sorted((
+            (normalize(name), {
+                'id': pk,
+                'name': name,
+                'measurement_unit': measurement_unit,
+            })
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            ).order_by()
+        ), key=itemgetter(0))
+        return [key for key, _ in entries], [item for _, item in entries]
+
+    def search(self, value, limit=None):
+        keys, items = self.data
+        query = normalize(value)
+        limit = limit or settings.INGREDIENT_AUTOCOMPLETE_LIMIT
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        result = items[start:min(end, start + limit)]
+        if len(result) < limit:
+            for position, key in enumerate(keys):
+                if query in key and not start <= position < end:
+                    result.append(items[position])
+                    if len(result) == limit:
+                        break
+        return result
+
+
+class RecipeIngredientIndex(LazyIndex):
+    """Инвертированный индекс: ингредиент -> отсортированные id рецептов.
+
+    Запросы «есть все из», «нет ни одного из» и «можно приготовить из
+    имеющихся, докупив не больше k» решаются пересечением множеств без
+    соединений по ``IngredientInRecipe``.
+    """
+    ttl_setting = 'RECIPE_INGREDIENT_INDEX_TTL'
+    version_scope = 'index:recipe-ingredients'
+
+    def build(self):
+        rows = IngredientInRecipe.objects.values_list(
+            'ingredient_id', 'recipe_id'
+        ).order_by('ingredient_id', 'recipe_id')
+        recipes = {}
+        sizes = Counter()
+        for ingredient_id, group in groupby(
+            rows.iterator(), key=itemgetter(0)
+        ):
+            recipe_ids = array('q', (recipe_id for _, recipe_id in group))
+            sizes.update(recipe_ids)
+            recipes[ingredient_id] = recipe_ids
+        all_ids = array('q', Recipe.objects.order_by('id').values_list(
+            'id', flat=True))
+        by_size = array('q', sorted(all_ids, key=sizes.__getitem__))
+        size_keys = array('q', (sizes[pk] for pk in by_size))
+        return recipes, sizes, all_ids, by_size, size_keys
+
+    def search(self, include=(), exclude=(), pantry=(), max_missing=0):
+        """Возвращает id рецептов: при ``pantry`` — по возрастанию числа
+        недостающих ингредиентов, иначе — от новых к старым."""
+        recipes, sizes, all_ids, by_size, size_keys = self.data
+        empty = array('q')
+        if pantry:
+            hits = Counter()
+            for ingredient_id in set(pantry):
+                hits.update(recipes.get(ingredient_id, empty))
+            # Рецепты, в которых не больше max_missing ингредиентов,
+            # подходят и без единого совпадения с pantry.
+            small = by_size[:bisect_right(size_keys, max_missing)]
+            missing = {
+                recipe_id: sizes[recipe_id] - hits[recipe_id]
+                for recipe_id in chain(hits, small)
+                if sizes[recipe_id] - hits[recipe_id] <= max_missing
+            }
+            result = set(missing)
+        else:
+            result = None
+        for ingredient_id in sorted(
+            set(include), key=lambda pk: len(recipes.get(pk, empty))
+        ):
+            if result is None:
+                result = set(recipes.get(ingredient_id, empty))
+            else:
+                result.intersection_update(recipes.get(ingredient_id, empty))
+        if result is None:
+            result = set(all_ids)
+        for ingredient_id in set(exclude):
+            result.difference_update(recipes.get(ingredient_id, empty))
+        if pantry:
+            return sorted(result, key=lambda pk: (missing[pk], -pk))
+        return sorted(result, reverse=True)
+
+
+ingredient_index = IngredientIndex()
+recipe_ingredient_index = RecipeIngredientIndex()
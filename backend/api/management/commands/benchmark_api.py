@@ -0,0 +1,91 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from api.benchmark import (DEFAULT_INGREDIENTS_PATH, Benchmark,
+                           DatasetFactory, compare, scenarios)
+
+COLUMNS = ('queries', 'p50_ms', 'p95_ms', 'peak_kb')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет число SQL-запросов, время ответа и память по маршрутам '
+        'API на синтетических данных во временной тестовой базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--ingredients', default=DEFAULT_INGREDIENTS_PATH)
+        parser.add_argument(
+            '--baseline',
+            help='JSON с прошлыми замерами; регрессии завершают команду '
+                 'с ошибкой',
+        )
+        parser.add_argument(
+            '--save-baseline',
+            help='Сохранить результаты в JSON для следующих сравнений',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Допустимый рост времени и памяти, доля от базового',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('Нужно не меньше 2 пользователей и 1 рецепта')
+        if not os.path.exists(options['ingredients']):
+            raise CommandError(
+                f'Нет файла ингредиентов: {options["ingredients"]}')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(
+                    MEDIA_ROOT=media_root,
+                    IMAGE_PROCESSING_BACKEND='sync',
+                ):
+                    results = self.measure(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.report(results)
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w',
+                      encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+        if baseline is not None:
+            regressions = compare(results, baseline, options['tolerance'])
+            if regressions:
+                lines = '\n'.join(regressions)
+                raise CommandError(f'Регрессии производительности:\n{lines}')
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def measure(self, options):
+        users, recipes = DatasetFactory(
+            users=options['users'],
+            recipes=options['recipes'],
+            ingredients_path=options['ingredients'],
+            seed=options['seed'],
+        ).create()
+        return Benchmark(users[0], options['repeat']).run(
+            scenarios(users, recipes))
+
+    def report(self, results):
+        width = max(len(name) for name in results)
+        header = ''.join(column.rjust(10) for column in COLUMNS)
+        self.stdout.write(f'{"route".ljust(width)}{header}')
+        for name, row in results.items():
+            cells = ''.join(str(row[column]).rjust(10) for column in COLUMNS)
+            self.stdout.write(f'{name.ljust(width)}{cells}')
@@ -0,0 +1,157 @@
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from api.benchmark import DEFAULT_INGREDIENTS_PATH, DatasetFactory, percentile
+
+SERVERS = {
+    'wsgi': ('foodgram.wsgi:application',),
+    'asgi': ('foodgram.asgi:application', '-k',
+             'uvicorn.workers.UvicornWorker'),
+}
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/users/subscriptions/',
+    '/api/recipes/download_shopping_cart/',
+)
+STARTUP_TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает WSGI и ASGI развёртывание под gunicorn с одинаковым '
+        'числом воркеров: запросы в секунду и хвосты времени ответа'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--server', action='append', choices=SERVERS, dest='servers')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--path', action='append', dest='paths')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=200)
+        parser.add_argument(
+            '--ingredients', default=DEFAULT_INGREDIENTS_PATH)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError(
+                'Сравнение серверов работает только с PostgreSQL')
+        self.paths = options['paths'] or DEFAULT_PATHS
+        self.threads = options['threads']
+        self.total = options['requests']
+        self.url = f'http://127.0.0.1:{options["port"]}'
+        old_name = connection.settings_dict['NAME']
+        test_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(
+                    MEDIA_ROOT=media_root,
+                    IMAGE_PROCESSING_BACKEND='sync',
+                ):
+                    users, _ = DatasetFactory(
+                        users=options['users'],
+                        recipes=options['recipes'],
+                        ingredients_path=options['ingredients'],
+                    ).create()
+                self.token = Token.objects.create(user=users[0]).key
+                connection.close()
+                self.stdout.write(
+                    f'{"server":<8}{"rps":>10}{"p50_ms":>10}{"p95_ms":>10}'
+                    f'{"p99_ms":>10}{"errors":>8}'
+                )
+                env = dict(os.environ, DB_NAME=test_name)
+                for server in options['servers'] or SERVERS:
+                    process = self.start(server, options, env)
+                    try:
+                        self.report(server, self.run())
+                    finally:
+                        process.terminate()
+                        process.wait()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def start(self, server, options, env):
+        process = subprocess.Popen(
+            (sys.executable, '-m', 'gunicorn', *SERVERS[server],
+             '--workers', str(options['workers']),
+             '--bind', f'127.0.0.1:{options["port"]}'),
+            cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'{server}: сервер не запустился')
+            try:
+                requests.get(f'{self.url}/api/tags/', timeout=1)
+            except requests.RequestException:
+                time.sleep(0.2)
+                continue
+            return process
+        process.terminate()
+        raise CommandError(f'{server}: сервер не ответил за '
+                           f'{STARTUP_TIMEOUT} с')
+
+    def run(self):
+        lock = threading.Lock()
+        counter = iter(range(self.total))
+        timings = []
+        errors = []
+
+        def worker():
+            local = []
+            session = requests.Session()
+            session.headers['Authorization'] = f'Token {self.token}'
+            while True:
+                with lock:
+                    number = next(counter, None)
+                if number is None:
+                    break
+                path = self.paths[number % len(self.paths)]
+                started = time.perf_counter()
+                response = session.get(f'{self.url}{path}')
+                local.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors.append(path)
+            session.close()
+            with lock:
+                timings.extend(local)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.threads) as executor:
+            for future in [
+                executor.submit(worker) for _ in range(self.threads)
+            ]:
+                future.result()
+        elapsed = time.perf_counter() - started
+        return {
+            'rps': len(timings) / elapsed,
+            'p50_ms': statistics.median(timings) * 1000,
+            'p95_ms': percentile(timings, 0.95) * 1000,
+            'p99_ms': percentile(timings, 0.99) * 1000,
+            'errors': len(errors),
+        }
+
+    def report(self, server, result):
+        self.stdout.write(
+            f'{server:<8}{result["rps"]:>10.1f}{result["p50_ms"]:>10.2f}'
+            f'{result["p95_ms"]:>10.2f}{result["p99_ms"]:>10.2f}'
+            f'{result["errors"]:>8}'
+        )
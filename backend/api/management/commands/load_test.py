@@ -0,0 +1,138 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from rest_framework.authtoken.models import Token
+
+from api.benchmark import DEFAULT_INGREDIENTS_PATH, DatasetFactory, percentile
+from foodgram.db.pool import close_pools, get_pool_stats
+
+MODES = ('connect', 'persistent', 'pool')
+DEFAULT_PATHS = ('/api/recipes/', '/api/tags/', '/api/recipes/feed/')
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест режимов подключения к PostgreSQL: новое '
+        'соединение на запрос, постоянные соединения и пул'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode', action='append', choices=MODES, dest='modes')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--pool-size', type=int)
+        parser.add_argument('--path', action='append', dest='paths')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=200)
+        parser.add_argument(
+            '--ingredients', default=DEFAULT_INGREDIENTS_PATH)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Нагрузочный тест работает только с PostgreSQL')
+        modes = options['modes'] or MODES
+        if 'pool' in modes and not hasattr(connection, 'pool'):
+            raise CommandError(
+                'Режим pool доступен только с DB_ENGINE=foodgram.db')
+        self.paths = options['paths'] or DEFAULT_PATHS
+        self.threads = options['threads']
+        self.total = options['requests']
+        pool_size = options['pool_size'] or self.threads
+        settings_dict = connections.databases[DEFAULT_DB_ALIAS]
+        original = {
+            key: settings_dict.get(key) for key in ('CONN_MAX_AGE', 'POOL')
+        }
+        old_name = settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            users, _ = DatasetFactory(
+                users=options['users'],
+                recipes=options['recipes'],
+                ingredients_path=options['ingredients'],
+            ).create()
+            self.token = Token.objects.create(user=users[0]).key
+            connection.close()
+            self.stdout.write(
+                f'{"mode":<12}{"rps":>10}{"p50_ms":>10}{"p95_ms":>10}'
+                f'{"connects":>10}{"wait_ms":>10}'
+            )
+            for mode in modes:
+                settings_dict.update(
+                    CONN_MAX_AGE=600 if mode == 'persistent' else 0,
+                    POOL={'MAX_SIZE': pool_size} if mode == 'pool' else None,
+                )
+                self.report(mode, self.run())
+                close_pools()
+        finally:
+            settings_dict.update(original)
+            close_pools()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self):
+        handler = WSGIHandler()
+        environ = RequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Token {self.token}').environ
+        lock = threading.Lock()
+        counter = iter(range(self.total))
+        timings = []
+        connects = []
+
+        def count_connect(**kwargs):
+            # С пулом сигнал приходит и на выдачу готового соединения,
+            # поэтому для пула берётся число открытых им соединений.
+            with lock:
+                connects.append(1)
+
+        def worker():
+            local = []
+            while True:
+                with lock:
+                    number = next(counter, None)
+                if number is None:
+                    break
+                path = self.paths[number % len(self.paths)]
+                started = time.perf_counter()
+                response = handler(
+                    dict(environ, PATH_INFO=path), lambda *args: None)
+                response.close()
+                local.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    raise CommandError(f'{path}: {response.status_code}')
+            connections.close_all()
+            with lock:
+                timings.extend(local)
+
+        connection_created.connect(count_connect)
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(self.threads) as executor:
+                for future in [
+                    executor.submit(worker) for _ in range(self.threads)
+                ]:
+                    future.result()
+        finally:
+            connection_created.disconnect(count_connect)
+        elapsed = time.perf_counter() - started
+        pool_stats = get_pool_stats().get(DEFAULT_DB_ALIAS, {})
+        return {
+            'rps': len(timings) / elapsed,
+            'p50_ms': statistics.median(timings) * 1000,
+            'p95_ms': percentile(timings, 0.95) * 1000,
+            'connects': pool_stats.get('created', len(connects)),
+            'wait_ms': pool_stats.get('wait_seconds', 0) * 1000,
+        }
+
+    def report(self, mode, result):
+        self.stdout.write(
+            f'{mode:<12}{result["rps"]:>10.1f}{result["p50_ms"]:>10.2f}'
+            f'{result["p95_ms"]:>10.2f}{result["connects"]:>10}'
+            f'{result["wait_ms"]:>10.1f}'
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from api.cart import rebuild_cart_ingredients
+from recipes.models import ShoppingCart
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает суммы ингредиентов в корзинах всех пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = list(ShoppingCart.objects.order_by('user_id').values_list(
+            'user_id', flat=True).distinct())
+        for start in range(0, len(user_ids), batch_size):
+            rebuild_cart_ingredients(user_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано корзин: {len(user_ids)}'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.search import update_search_vectors
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает поисковые векторы всех рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(
+                'Полнотекстовый поиск доступен только в PostgreSQL')
+            return
+        batch_size = options['batch_size']
+        ids = list(Recipe.objects.order_by('id').values_list('id', flat=True))
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            update_search_vectors(Recipe.objects.filter(
+                id__range=(batch[0], batch[-1])))
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {len(ids)}'))
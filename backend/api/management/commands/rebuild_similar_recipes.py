@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.similarity import rebuild_similar
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожие рецепты по общим ингредиентам и тегам; '
+        'между запусками список обновляется при изменении рецептов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = rebuild_similar(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Сохранено пар похожих рецептов: {created}'))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from api.counters import actual_count, recount_counter
+from api.feed import rebuild_author_feeds
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follower, User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follower, 'following'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики избранного, корзин, рецептов и подписчиков'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать число расхождений',
+        )
+
+    def handle(self, *args, **options):
+        for model, field, related, field_name in COUNTERS:
+            drifted = model.objects.annotate(
+                actual=actual_count(related, field_name)
+            ).exclude(**{field: F('actual')}).values('pk')
+            with transaction.atomic():
+                if options['dry_run']:
+                    fixed = drifted.count()
+                elif field == 'followers_count':
+                    # Исправленный счётчик может перевести автора через
+                    # порог раскладки ленты.
+                    authors = [row['pk'] for row in drifted]
+                    fixed = recount_counter(
+                        model, authors, field, related, field_name)
+                    for author_id in authors:
+                        rebuild_author_feeds(author_id)
+                else:
+                    fixed = recount_counter(
+                        model, drifted, field, related, field_name)
+            self.stdout.write(
+                f'{model._meta.model_name}.{field}: исправлено {fixed}'
+            )
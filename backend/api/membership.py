@@ -0,0 +1,85 @@
+from array import array
+from bisect import bisect_left
+
+from django.db.models import IntegerField, Value
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Follower
+
+FAVORITES, CART, FOLLOWING = range(3)
+
+
+class IdSet:
+    """Компактное множество id для проверки принадлежности.
+
+    Плотные наборы хранятся битовой картой от минимального id (проверка
+    за O(1)), разреженные — отсортированным массивом с бинарным поиском,
+    если битовая карта вышла бы больше массива.
+    """
+    __slots__ = ('offset', 'bits', 'ids')
+
+    def __init__(self, ids):
+        ids = sorted(set(ids))
+        self.offset = ids[0] if ids else 0
+        self.bits = None
+        self.ids = None
+        span = ids[-1] - self.offset + 1 if ids else 0
+        if span // 8 <= len(ids) * 8:
+            self.bits = bytearray((span + 7) // 8)
+            for pk in ids:
+                shift = pk - self.offset
+                self.bits[shift >> 3] |= 1 << (shift & 7)
+        else:
+            self.ids = array('q', ids)
+
+    def __contains__(self, pk):
+        if self.ids is not None:
+            position = bisect_left(self.ids, pk)
+            return position < len(self.ids) and self.ids[position] == pk
+        shift = pk - self.offset
+        if shift < 0 or shift >> 3 >= len(self.bits):
+            return False
+        return bool(self.bits[shift >> 3] & (1 << (shift & 7)))
+
+
+class UserMemberships:
+    """Избранное, корзина и подписки пользователя."""
+    __slots__ = ('favorites', 'cart', 'following')
+
+    def __init__(self, user):
+        ids = ([], [], [])
+        for pk, kind in self.query(user):
+            ids[kind].append(pk)
+        self.favorites = IdSet(ids[FAVORITES])
+        self.cart = IdSet(ids[CART])
+        self.following = IdSet(ids[FOLLOWING])
+
+    @staticmethod
+    def query(user):
+        """Все три набора одним запросом UNION ALL, id помечены
+        номером набора."""
+        parts = [
+            model.objects.filter(user=user).annotate(
+                kind=Value(kind, output_field=IntegerField()),
+            ).values_list(field, 'kind').order_by()
+            for model, field, kind in (
+                (Favorite, 'recipe_id', FAVORITES),
+                (ShoppingCart, 'recipe_id', CART),
+                (Follower, 'following_id', FOLLOWING),
+            )
+        ]
+        return parts[0].union(*parts[1:], all=True)
+
+
+def get_memberships(request):
+    """Возвращает наборы пользователя, загружая их один раз за запрос.
+
+    Между запросами наборы не кэшируются: иначе переключение в одном
+    воркере, правка в админке или каскадное удаление оставляли бы
+    устаревшие флаги в остальных.
+    """
+    memberships = getattr(request, '_memberships', None)
+    if memberships is None:
+        memberships = UserMemberships(request.user)
+        request._memberships = memberships
+    return memberships
@@ -0,0 +1,278 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.renderers import BaseRenderer
+
+from api.cache import get_stats
+from foodgram.db.pool import get_pool_stats
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+SLOW_REQUEST_MAX_QUERIES = 200
+COUNTERS = (
+    ('sql_queries', 'Число SQL-запросов.'),
+    ('sql_seconds', 'Время выполнения SQL.'),
+    ('serialize_seconds', 'Время сериализации ответов.'),
+    ('duplicate_queries', 'Повторные запросы с одинаковым шаблоном.'),
+    ('response_bytes', 'Размер ответов без потоковых выгрузок.'),
+)
+LABEL_NAMES = ('endpoint', 'method', 'status')
+POOL_COUNTERS = (
+    ('wait_seconds', 'Время ожидания свободного соединения.'),
+    ('acquired', 'Выданные из пула соединения.'),
+    ('timeouts', 'Отказы по таймауту ожидания.'),
+    ('created', 'Открытые пулом соединения.'),
+)
+
+IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+WHITESPACE = re.compile(r'\s+')
+
+current_profile = ContextVar('api_request_profile', default=None)
+
+
+def fingerprint(sql):
+    """Приводит запрос к шаблону: списки ``IN (...)``, числа и строки
+    заменяются заглушками, чтобы одинаковые запросы с разными
+    параметрами совпадали."""
+    sql = IN_LIST.sub('(...)', sql)
+    sql = LITERALS.sub('?', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+class RequestProfile:
+    """Счётчики одного запроса: SQL, сериализация, шаблоны запросов.
+
+    Текст запросов сохраняется только при ``keep_sql``, он нужен журналу
+    медленных запросов.
+    """
+
+    def __init__(self, keep_sql=False):
+        self.keep_sql = keep_sql
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serialize_time = 0.0
+        self.fingerprints = Counter()
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.sql_time += duration
+            self.fingerprints[fingerprint(sql)] += 1
+            if self.keep_sql and (
+                len(self.statements) < SLOW_REQUEST_MAX_QUERIES
+            ):
+                self.statements.append((duration, sql, params))
+
+    @property
+    def duplicates(self):
+        """Повторы одного шаблона — признак N+1."""
+        return {
+            sql: count for sql, count in self.fingerprints.items()
+            if count > 1
+        }
+
+
+def profile_query(execute, sql, params, many, context):
+    """Обёртка выполнения запросов, общая для всех соединений.
+
+    Профиль берётся из контекстной переменной, поэтому запросы
+    учитываются и в потоках ``sync_to_async`` при работе через ASGI.
+    """
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def profile_serializer(serializer):
+    """Учитывает время сериализации ответа в профиле запроса.
+
+    Обёртка ставится на экземпляр, поэтому замеряется только внешний
+    вызов: вложенные сериализаторы и элементы списка попадают в него же.
+    Ленивые запросы, выполненные при сериализации, входят и во время SQL.
+    """
+    to_representation = serializer.to_representation
+
+    def timed(instance):
+        profile = current_profile.get()
+        if profile is None:
+            return to_representation(instance)
+        started = time.perf_counter()
+        try:
+            return to_representation(instance)
+        finally:
+            profile.serialize_time += time.perf_counter() - started
+
+    serializer.to_representation = timed
+    return serializer
+
+
+class ProfiledViewMixin:
+    """Замеряет сериализацию всех ответов представления."""
+
+    def get_serializer(self, *args, **kwargs):
+        return profile_serializer(super().get_serializer(*args, **kwargs))
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def format_labels(values):
+    return ','.join(
+        f'{name}="{escape_label(value)}"'
+        for name, value in zip(LABEL_NAMES, values)
+    )
+
+
+class Histogram:
+    __slots__ = ('buckets', 'total', 'count')
+
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        position = bisect_left(DURATION_BUCKETS, value)
+        if position < len(self.buckets):
+            self.buckets[position] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsAggregator:
+    """Накопитель метрик процесса в формате Prometheus.
+
+    Данные живут в памяти процесса: при нескольких воркерах каждый
+    отдаёт свои значения, их суммирует Prometheus по метке ``instance``.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations = defaultdict(Histogram)
+        self.counters = defaultdict(Counter)
+
+    def observe(self, endpoint, method, status, duration, profile, size):
+        labels = (endpoint, method, str(status))
+        with self.lock:
+            self.durations[labels].observe(duration)
+            counters = self.counters[labels]
+            counters['sql_queries'] += profile.queries
+            counters['sql_seconds'] += profile.sql_time
+            counters['serialize_seconds'] += profile.serialize_time
+            counters['duplicate_queries'] += sum(
+                count - 1 for count in profile.duplicates.values()
+            )
+            if size is not None:
+                counters['response_bytes'] += size
+
+    def render(self):
+        with self.lock:
+            durations = {
+                labels: (list(histogram.buckets), histogram.total,
+                         histogram.count)
+                for labels, histogram in self.durations.items()
+            }
+            counters = {
+                labels: dict(values)
+                for labels, values in self.counters.items()
+            }
+        lines = [
+            '# HELP api_request_duration_seconds Время обработки запроса.',
+            '# TYPE api_request_duration_seconds histogram',
+        ]
+        for labels, (buckets, total, count) in sorted(durations.items()):
+            label = format_labels(labels)
+            cumulative = 0
+            for bound, bucket in zip(DURATION_BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(
+                    f'api_request_duration_seconds_bucket'
+                    f'{{{label},le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f'api_request_duration_seconds_bucket'
+                f'{{{label},le="+Inf"}} {count}'
+            )
+            lines.append(
+                f'api_request_duration_seconds_sum{{{label}}} {total}')
+            lines.append(
+                f'api_request_duration_seconds_count{{{label}}} {count}')
+        for name, help_text in COUNTERS:
+            lines.append(f'# HELP api_{name}_total {help_text}')
+            lines.append(f'# TYPE api_{name}_total counter')
+            for labels, values in sorted(counters.items()):
+                lines.append(
+                    f'api_{name}_total{{{format_labels(labels)}}} '
+                    f'{values.get(name, 0)}'
+                )
+        lines.append('# HELP api_cache_requests_total Обращения к кэшу API.')
+        lines.append('# TYPE api_cache_requests_total counter')
+        for (resource, result), count in sorted(get_stats().items()):
+            lines.append(
+                f'api_cache_requests_total{{resource="{resource}",'
+                f'result="{result}"}} {count}'
+            )
+        lines.extend(render_pool_stats(get_pool_stats()))
+        return '\n'.join(lines) + '\n'
+
+
+def render_pool_stats(pools):
+    lines = []
+    for name, help_text in POOL_COUNTERS:
+        lines.append(f'# HELP api_db_pool_{name}_total {help_text}')
+        lines.append(f'# TYPE api_db_pool_{name}_total counter')
+        for alias, stats in sorted(pools.items()):
+            lines.append(
+                f'api_db_pool_{name}_total{{alias="{alias}"}} '
+                f'{stats.get(name, 0)}'
+            )
+    lines.append('# HELP api_db_pool_connections Соединения пула.')
+    lines.append('# TYPE api_db_pool_connections gauge')
+    for alias, stats in sorted(pools.items()):
+        for state in ('in_use', 'idle', 'max_size'):
+            lines.append(
+                f'api_db_pool_connections{{alias="{alias}",'
+                f'state="{state}"}} {stats.get(state, 0)}'
+            )
+    return lines
+
+
+aggregator = MetricsAggregator()
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Текстовый формат экспозиции Prometheus версии 0.0.4."""
+    media_type = 'text/plain; version=0.0.4'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return str(data).encode(self.charset)
+
+
+class MetricsContentNegotiation(BaseContentNegotiation):
+    """Всегда отдаёт метрики первым рендерером.
+
+    Параметр ``version`` в типе рендерера DRF требует и в Accept,
+    поэтому запросы с ``*/*`` или ``text/plain`` иначе получали бы 406.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from rest_framework.permissions import SAFE_METHODS
+
+from api.cache import get_cache, is_process_local
+from api.metrics import RequestProfile, aggregator, current_profile
+from foodgram.db.router import REPLICA_ALIAS, replica_allowed
+
+PIN_KEY = 'api:db-pin:{}'
+PIN_CACHE_ERROR = (
+    'Реплика требует общего для воркеров кэша: закрепление за основной '
+    'базой в кэше "{}" в памяти процесса не увидят другие воркеры'
+)
+
+logger = logging.getLogger(__name__)
+
+
+class HybridMiddleware:
+    """Основа middleware, работающего и под WSGI, и под ASGI.
+
+    Наследники реализуют ``before``, ``after`` и ``cleanup``. В
+    асинхронной цепочке ответ ожидается через ``await``, без перехода в
+    синхронный поток, который в Django 3.2 один на процесс.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Та же пометка, что ставит MiddlewareMixin в Django.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state = self.before(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.cleanup(state)
+        return self.after(request, response, state)
+
+    async def __acall__(self, request):
+        state = self.before(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.cleanup(state)
+        return self.after(request, response, state)
+
+    def before(self, request):
+        return None
+
+    def cleanup(self, state):
+        pass
+
+    def after(self, request, response, state):
+        return response
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Профилирует каждый запрос: время, SQL, сериализация, размер ответа.
+
+    Итоги попадают в заголовок ``Server-Timing`` и в агрегатор для
+    ``/api/metrics/``. Если задан ``SLOW_REQUEST_THRESHOLD_MS``, запросы
+    дольше порога пишутся в журнал вместе с текстом SQL и повторяющимися
+    шаблонами запросов.
+    """
+
+    def before(self, request):
+        if not settings.API_METRICS_ENABLED:
+            return None
+        threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+        profile = RequestProfile(keep_sql=threshold is not None)
+        token = current_profile.set(profile)
+        return profile, token, time.perf_counter()
+
+    def cleanup(self, state):
+        if state is not None:
+            current_profile.reset(state[1])
+
+    def after(self, request, response, state):
+        if state is None:
+            return response
+        profile, _, started = state
+        duration = time.perf_counter() - started
+        size = None if response.streaming else len(response.content)
+        response['Server-Timing'] = server_timing(profile, duration)
+        match = request.resolver_match
+        endpoint = match.view_name if match else 'unresolved'
+        aggregator.observe(
+            endpoint, request.method, response.status_code, duration,
+            profile, size,
+        )
+        threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+        if threshold is not None and duration * 1000 >= threshold:
+            log_slow_request(request, response, duration, profile)
+        return response
+
+
+def server_timing(profile, duration):
+    return ', '.join((
+        f'db;dur={profile.sql_time * 1000:.1f};'
+        f'desc="{profile.queries} queries"',
+        f'serialize;dur={profile.serialize_time * 1000:.1f}',
+        f'total;dur={duration * 1000:.1f}',
+    ))
+
+
+def log_slow_request(request, response, duration, profile):
+    statements = '\n'.join(
+        f'  {seconds * 1000:.1f} ms: {sql} {params}'
+        for seconds, sql, params in profile.statements
+    )
+    duplicates = '\n'.join(
+        f'  x{count}: {sql}'
+        for sql, count in sorted(
+            profile.duplicates.items(), key=lambda item: -item[1])
+    )
+    logger.warning(
+        'Медленный запрос %s %s: %s, %.1f ms, SQL: %s за %.1f ms, '
+        'сериализация %.1f ms\nЗапросы:\n%s\nПовторы:\n%s',
+        request.method, request.get_full_path(), response.status_code,
+        duration * 1000, profile.queries, profile.sql_time * 1000,
+        profile.serialize_time * 1000, statements, duplicates or '  нет',
+    )
+
+
+def get_pin_key(request):
+    """Ключ закрепления: токен из заголовка или сессия."""
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    identity = request.META.get('HTTP_AUTHORIZATION') or session
+    if not identity:
+        return None
+    digest = hashlib.md5(identity.encode()).hexdigest()
+    return PIN_KEY.format(digest)
+
+
+class ReplicaMiddleware(HybridMiddleware):
+    """Разрешает чтения с реплики в безопасных запросах.
+
+    После пишущего запроса пользователь на
+    ``DATABASE_REPLICA_PIN_SECONDS`` закрепляется за основной базой,
+    чтобы видеть свои изменения, пока реплика догоняет. Закрепление
+    хранится в кэше API, поэтому кэш должен быть общим для воркеров.
+    """
+
+    def __init__(self, get_response):
+        if REPLICA_ALIAS not in settings.DATABASES:
+            raise MiddlewareNotUsed
+        if is_process_local(settings.API_CACHE_ALIAS):
+            raise ImproperlyConfigured(
+                PIN_CACHE_ERROR.format(settings.API_CACHE_ALIAS))
+        super().__init__(get_response)
+
+    def before(self, request):
+        key = get_pin_key(request)
+        return self.enter(request, key, is_pinned(key))
+
+    def enter(self, request, key, pinned):
+        safe = request.method in SAFE_METHODS
+        return key, safe, replica_allowed.set(safe and not pinned)
+
+    def cleanup(self, state):
+        replica_allowed.reset(state[2])
+
+    def after(self, request, response, state):
+        key, safe, _ = state
+        if not safe and key is not None:
+            pin(key)
+        return response
+
+    async def __acall__(self, request):
+        # Кэш по умолчанию хранится в базе, поэтому обращения к нему из
+        # цикла событий уходят в синхронный поток.
+        key = get_pin_key(request)
+        state = self.enter(
+            request, key, await sync_to_async(is_pinned)(key))
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.cleanup(state)
+        if not state[1] and key is not None:
+            await sync_to_async(pin)(key)
+        return response
+
+
+def is_pinned(key):
+    return key is not None and get_cache().get(key) is not None
+
+
+def pin(key):
+    get_cache().set(key, True, settings.DATABASE_REPLICA_PIN_SECONDS)
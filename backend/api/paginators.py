@@ -1,5 +1,253 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from heapq import merge
+from itertools import groupby, islice
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from api.filters import ORDERING_FIELDS
+
+
+class RecipeCursorPaginator(BasePagination):
+    """Keyset-пагинация: страница выбирается по значениям всего ключа
+    сортировки, без COUNT(*) и OFFSET, поэтому глубокие страницы не
+    дороже первой.
+
+    Ключ берётся из ``?ordering=`` фильтра рецептов, по умолчанию
+    (pub_date, id); id в конце ключа разрешает совпадения остальных
+    полей. Курсор хранит значения всех полей ключа. Ответ сохраняет
+    формат постраничного режима, но ``count`` не вычисляется.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    invalid_cursor_message = 'Неверный курсор'
+    ordering = ORDERING_FIELDS['newest']
+
+    def get_ordering(self, request, queryset, view):
+        return ORDERING_FIELDS.get(
+            request.query_params.get('ordering'), self.ordering
+        )
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            page_size = 0
+        return page_size if page_size > 0 else api_settings.PAGE_SIZE
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            reverse, *values = b64decode(encoded).decode().split('|')
+            if reverse not in ('0', '1') or len(values) != len(self.fields):
+                raise ValueError
+            values = [
+                field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, UnicodeDecodeError,
+                DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse == '1', values
+
+    def encode_cursor(self, reverse, instance):
+        values = [field.value_to_string(instance) for field in self.fields]
+        return b64encode(
+            '|'.join((str(int(reverse)), *values)).encode()
+        ).decode()
+
+    def get_filter(self, values, ordering):
+        """Строки строго после ``values`` в порядке ``ordering``:
+        (a, b, c) > (x, y, z) раскрывается в a > x, или a = x и b > y,
+        или a = x, b = y и c > z.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = self.get_ordering(request, queryset, view)
+        self.fields = [
+            queryset.model._meta.get_field(field.lstrip('-'))
+            for field in ordering
+        ]
+        size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor[0]
+        if reverse:
+            ordering = [
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in ordering
+            ]
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_filter(cursor[1], ordering))
+        page = list(queryset[:size + 1])
+        has_more = len(page) > size
+        page = page[:size]
+        if reverse:
+            page.reverse()
+        self.has_next = cursor is not None if reverse else has_more
+        self.has_previous = has_more if reverse else cursor is not None
+        self.page = page
+        return page
+
+    def get_link(self, reverse, instance):
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.encode_cursor(reverse, instance)
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.get_link(True, self.page[0])
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', None),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class SubscriptionCursorPaginator(RecipeCursorPaginator):
+    ordering = ('id',)
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
 
 
 class RecipePaginator(PageNumberPagination):
+    """Постраничная пагинация с параметром ``limit``.
+
+    Запрос с ``?pagination=cursor`` или с курсором из ссылки
+    ``next``/``previous`` обслуживается keyset-пагинацией.
+    """
     page_size_query_param = 'limit'
+    cursor_paginator_class = RecipeCursorPaginator
+    cursor_paginator = None
+
+    def use_cursor(self, request):
+        cursor_query_param = self.cursor_paginator_class.cursor_query_param
+        if cursor_query_param in request.query_params:
+            return True
+        return request.query_params.get('pagination') == 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_paginator_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class SubscriptionPaginator(RecipePaginator):
+    cursor_paginator_class = SubscriptionCursorPaginator
+
+
+class IdListPaginator(PageNumberPagination):
+    """Постраничная выдача готового списка id из индекса в памяти."""
+    page_size_query_param = 'limit'
+
+
+class FeedPaginator(BasePagination):
+    """Keyset-пагинация ленты по ключу (pub_date, id рецепта).
+
+    Принимает несколько упорядоченных источников ключей, из каждого
+    читает не больше страницы и сливает их, отбрасывая повторы.
+    Страница — список id рецептов.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            page_size = 0
+        return page_size if page_size > 0 else api_settings.PAGE_SIZE
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            pub_date, pk = b64decode(encoded).decode().split('|')
+            pub_date, pk = parse_datetime(pub_date), int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, pk
+
+    def encode_cursor(self, key):
+        pub_date, pk = key
+        return b64encode(f'{pub_date.isoformat()}|{pk}'.encode()).decode()
+
+    def read_source(self, queryset, id_field, cursor, size):
+        if cursor is not None:
+            pub_date, pk = cursor
+            older = Q(pub_date__lt=pub_date)
+            same_date = Q(pub_date=pub_date, **{f'{id_field}__lt': pk})
+            queryset = queryset.filter(older | same_date)
+        return list(queryset.order_by(
+            '-pub_date', f'-{id_field}'
+        ).values_list('pub_date', id_field)[:size])
+
+    def paginate_queryset(self, sources, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        keys = merge(
+            *(self.read_source(queryset, id_field, cursor, size + 1)
+              for queryset, id_field in sources),
+            reverse=True,
+        )
+        keys = [key for key, _ in islice(groupby(keys), size + 1)]
+        self.next_key = keys[size - 1] if len(keys) > size else None
+        return [pk for _, pk in keys[:size]]
+
+    def get_next_link(self):
+        if self.next_key is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.encode_cursor(self.next_key)
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', None),
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ]))
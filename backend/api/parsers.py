@@ -0,0 +1,27 @@
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+MULTIPART_DATA_ERROR = 'Поле data должно содержать JSON-объект'
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """multipart/form-data с полями рецепта в части ``data``.
+
+    Вложенные ингредиенты и теги передаются JSON-строкой, изображение —
+    отдельным файлом, который Django пишет на диск по частям.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        result = super().parse(stream, media_type, parser_context)
+        if 'data' not in result.data:
+            return result
+        try:
+            data = json.loads(result.data['data'])
+        except ValueError:
+            raise ParseError(MULTIPART_DATA_ERROR)
+        if not isinstance(data, dict):
+            raise ParseError(MULTIPART_DATA_ERROR)
+        data.update(result.files.dict())
+        return DataAndFiles(data, {})
@@ -0,0 +1,144 @@
+import logging
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, TrigramSimilarity)
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from api.batching import CommitBatch
+from recipes.models import IngredientInRecipe, Recipe
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEXES = (
+    ('recipe_search_vector_idx',
+     'CREATE INDEX {name} ON {table} USING gin (search_vector)'),
+)
+TRIGRAM_INDEXES = (
+    ('recipe_name_trgm_idx',
+     'CREATE INDEX {name} ON {table} USING gin (name gin_trgm_ops)'),
+)
+TRIGRAM_EXTENSION = 'CREATE EXTENSION IF NOT EXISTS pg_trgm'
+
+_trigram_support = {}
+
+
+def is_postgres(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def has_trigram(using):
+    """Проверяет, установлено ли расширение pg_trgm в базе ``using``.
+
+    Ответ запоминается для алиаса до конца работы процесса и
+    сбрасывается только после ``create_search_indexes``.
+    """
+    if using not in _trigram_support:
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_support[using] = cursor.fetchone() is not None
+    return _trigram_support[using]
+
+
+def recipe_search_vector():
+    """Название — вес A, ингредиенты — B, описание — C."""
+    ingredient_names = Subquery(
+        IngredientInRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    config = settings.SEARCH_CONFIG
+    name = SearchVector('name', weight='A', config=config)
+    ingredients = SearchVector(
+        Coalesce(ingredient_names, Value('')), weight='B', config=config
+    )
+    text = SearchVector('text', weight='C', config=config)
+    return name + ingredients + text
+
+
+def update_search_vectors(recipes):
+    """Пересчитывает поисковый вектор одним UPDATE для всех рецептов."""
+    if is_postgres(recipes.db):
+        recipes.update(search_vector=recipe_search_vector())
+
+
+def flush_search_updates(ids, using):
+    update_search_vectors(Recipe.objects.db_manager(using).filter(id__in=ids))
+
+
+search_updates = CommitBatch(flush_search_updates)
+
+
+def schedule_search_update(recipe_id, using):
+    """Откладывает пересчёт вектора до фиксации транзакции: все рецепты,
+    изменённые в транзакции, обновляются одним UPDATE."""
+    if is_postgres(using):
+        search_updates.add(recipe_id, using)
+
+
+def search_recipes(queryset, value):
+    """Полнотекстовый поиск с ранжированием, при пустом результате —
+    поиск по похожим названиям для запросов с опечатками.
+
+    На других СУБД выполняется простой поиск по вхождению подстроки.
+    """
+    if not is_postgres(queryset.db):
+        with_ingredient = IngredientInRecipe.objects.filter(
+            ingredient__name__icontains=value).values('recipe_id')
+        return queryset.filter(Q(name__icontains=value) | Q(
+            text__icontains=value) | Q(id__in=with_ingredient))
+    query = SearchQuery(
+        value, config=settings.SEARCH_CONFIG, search_type='websearch'
+    )
+    matches = queryset.filter(search_vector=query)
+    if matches.exists() or not has_trigram(queryset.db):
+        return matches.annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-pub_date', '-id')
+    return queryset.filter(name__trigram_similar=value).annotate(
+        similarity=TrigramSimilarity('name', value)
+    ).order_by('-similarity', '-pub_date', '-id')
+
+
+def create_indexes(connection, indexes):
+    """Создаёт индексы рецептов, которых ещё нет в базе."""
+    table = Recipe._meta.db_table
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        existing = connection.introspection.get_constraints(cursor, table)
+        for name, statement in indexes:
+            if name not in existing:
+                cursor.execute(statement.format(
+                    name=quote(name), table=quote(table)))
+
+
+def create_search_indexes(using):
+    """Создаёт GIN-индексы поиска в базе ``using``, если их там нет.
+
+    Вызывается после каждого migrate, поэтому существующие индексы не
+    пересоздаются, а базы, куда роутер не пускает миграции, например
+    реплика, пропускаются. Без pg_trgm работает только полнотекстовый
+    поиск.
+    """
+    if not router.allow_migrate_model(using, Recipe) or not is_postgres(
+        using
+    ):
+        return
+    connection = connections[using]
+    create_indexes(connection, SEARCH_INDEXES)
+    _trigram_support.pop(using, None)
+    try:
+        with transaction.atomic(using=using):
+            if not has_trigram(using):
+                with connection.cursor() as cursor:
+                    cursor.execute(TRIGRAM_EXTENSION)
+            create_indexes(connection, TRIGRAM_INDEXES)
+    except DatabaseError as error:
+        logger.warning('Поиск по похожим названиям недоступен: %s', error)
+    _trigram_support.pop(using, None)
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework.serializers import (
@@ -8,16 +10,21 @@ from rest_framework.serializers import (
     PrimaryKeyRelatedField,
     ValidationError,
     IntegerField,
-    ImageField,
     SerializerMetaclass,
-    CharField
+    CharField,
+    ListField,
 )
 
-from users.models import Follower, User
+from api.counters import change_counter
+from api.feed import fan_out
+from api.fields import RecipeImageField, RecipeImageUploadField
+from api.images import reset_variants, schedule_image_processing
+from api.membership import get_memberships
+from users.models import User
 from recipes.models import (
-    Ingredient, Tag, IngredientInRecipe,
-    Recipe, Favorite, ShoppingCart,
+    CartIngredient, Ingredient, Tag, IngredientInRecipe, Recipe, TagInRecipe,
 )
+from recipes.signals import recipe_ingredients_changed
 
 UNIQUE_INGREDIENT_VALIDATION_ERROR = 'Ингредиент уже есть в рецепте'
 NOT_INGREDIENT_VALIDATION_ERROR = 'Ингредиента нет в базе'
@@ -30,10 +37,7 @@ class UserSerializer(metaclass=SerializerMetaclass):
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
-        if Follower.objects.filter(
-                user=request.user, following__id=obj.id).exists():
-            return True
-        return False
+        return obj.id in get_memberships(request).following
 
 
 class UserDetailSerializer(UserCreateSerializer, UserSerializer):
@@ -60,24 +64,17 @@ class CommonRecipe(metaclass=SerializerMetaclass):
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
-        if Favorite.objects.filter(user=request.user,
-                                   recipe__id=obj.id).exists():
-            return True
+        return obj.id in get_memberships(request).favorites
 
     def get_is_in_shopping_cart(self, obj):
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
-        if ShoppingCart.objects.filter(user=request.user,
-                                       recipe__id=obj.id).exists():
-            return True
+        return obj.id in get_memberships(request).cart
 
 
 class CommonCount(metaclass=SerializerMetaclass):
-    recipes_count = SerializerMethodField()
-
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author__id=obj.id).count()
+    recipes_count = ReadOnlyField()
 
 
 class IngredientSerializer(ModelSerializer):
@@ -108,6 +105,22 @@ class IngredientEditSerializer(ModelSerializer):
         fields = ('id', 'amount')
 
 
+class CartIngredientSerializer(ModelSerializer):
+    id = ReadOnlyField(source='ingredient.id')
+    name = ReadOnlyField(source='ingredient.name')
+    measurement_unit = ReadOnlyField(
+        source='ingredient.measurement_unit')
+
+    class Meta:
+        model = CartIngredient
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class ServingsSerializer(Serializer):
+    servings = IntegerField(
+        min_value=1, max_value=settings.CART_MAX_SERVINGS, default=1)
+
+
 class TagSerializer(ModelSerializer):
     class Meta:
         model = Tag
@@ -116,12 +129,7 @@ class TagSerializer(ModelSerializer):
 
 class RecipeSerializer(ModelSerializer,
                        CommonRecipe):
-    image = ImageField(
-        max_length=None,
-        required=True,
-        allow_empty_file=False,
-        use_url=True,
-    )
+    image = RecipeImageField(variant='image_webp')
     author = UserDetailSerializer(read_only=True)
     tags = TagSerializer(many=True)
     ingredients = IngredientInRecipeSerializer(
@@ -136,6 +144,10 @@ class RecipeSerializer(ModelSerializer,
                   'is_in_shopping_cart', 'is_favorited')
 
 
+class RecipeListSerializer(RecipeSerializer):
+    image = RecipeImageField(variant='thumbnail')
+
+
 class RecipeSerializerPost(ModelSerializer,
                            CommonRecipe):
     author = UserDetailSerializer(read_only=True)
@@ -144,7 +156,7 @@ class RecipeSerializerPost(ModelSerializer,
         many=True)
     ingredients = IngredientEditSerializer(
         source='ingredient_recipes', many=True)
-    image = Base64ImageField(max_length=None, use_url=False,)
+    image = RecipeImageUploadField(max_length=None)
 
     class Meta:
         model = Recipe
@@ -153,18 +165,21 @@ class RecipeSerializerPost(ModelSerializer,
                   'is_in_shopping_cart', 'is_favorited')
 
     def validate_ingredients(self, value):
-        ingredients_list = []
-        ingredients = value
-        for ingredient in ingredients:
-            id_to_check = ingredient['ingredient']['id']
-            ingredient_to_check = Ingredient.objects.filter(id=id_to_check)
-            if not ingredient_to_check.exists():
-                raise ValidationError(
-                    NOT_INGREDIENT_VALIDATION_ERROR)
-            if ingredient_to_check in ingredients_list:
-                raise ValidationError(
-                    UNIQUE_INGREDIENT_VALIDATION_ERROR)
-            ingredients_list.append(ingredient_to_check)
+        ids = [ingredient['ingredient']['id'] for ingredient in value]
+        existing = set(Ingredient.objects.filter(
+            id__in=ids).order_by().values_list('id', flat=True))
+        checked = set()
+        errors = []
+        for id_to_check in ids:
+            if id_to_check not in existing:
+                errors.append({'id': [NOT_INGREDIENT_VALIDATION_ERROR]})
+            elif id_to_check in checked:
+                errors.append({'id': [UNIQUE_INGREDIENT_VALIDATION_ERROR]})
+            else:
+                errors.append({})
+            checked.add(id_to_check)
+        if any(errors):
+            raise ValidationError(errors)
         return value
 
     @staticmethod
@@ -184,6 +199,7 @@ class RecipeSerializerPost(ModelSerializer,
     def _create_tags(tags, recipe):
         recipe.tags.set(tags)
 
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         tags = validated_data.pop('tags')
@@ -191,27 +207,92 @@ class RecipeSerializerPost(ModelSerializer,
         recipe = Recipe.objects.create(author=author, **validated_data)
         RecipeSerializerPost._create_tags(tags, recipe)
         RecipeSerializerPost._create_ingredients(ingredients, recipe)
+        recipe_ingredients_changed.send(
+            sender=Recipe, instance=recipe, using=recipe._state.db)
         recipe.save()
+        change_counter(User, author.id, 'recipes_count', 1)
+        fan_out(recipe)
+        schedule_image_processing(recipe.id)
         return recipe
 
-    def update(self, instance, validated_data):
-        instance.name = validated_data.pop('name', instance.name)
-        instance.image = validated_data.pop('image', instance.image)
-        instance.text = validated_data.pop('text', instance.text)
-        instance.cooking_time = validated_data.pop(
-            'cooking_time',
-            instance.cooking_time
+    @staticmethod
+    def _update_tags(tags, recipe):
+        current = set(TagInRecipe.objects.filter(
+            recipe=recipe).values_list('tag_id', flat=True))
+        new = {tag.id for tag in tags}
+        if current == new:
+            return False
+        TagInRecipe.objects.bulk_create(
+            [TagInRecipe(recipe=recipe, tag_id=tag_id)
+             for tag_id in new - current]
         )
-        instance.ingredients.clear()
-        ingredients = validated_data.pop('ingredient_recipes')
-        RecipeSerializerPost._create_ingredients(ingredients, instance)
-        instance.tags.clear()
-        tags = validated_data.pop('tags')
-        RecipeSerializerPost._create_tags(tags, instance)
-        return super().update(instance, validated_data)
+        if current - new:
+            TagInRecipe.objects.filter(
+                recipe=recipe, tag_id__in=current - new).delete()
+        return True
+
+    @staticmethod
+    def _update_ingredients(ingredients, recipe):
+        current = {
+            item.ingredient_id: item
+            for item in IngredientInRecipe.objects.filter(recipe=recipe)
+        }
+        new = {
+            ingredient['ingredient']['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        created = [
+            IngredientInRecipe(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount)
+            for ingredient_id, amount in new.items()
+            if ingredient_id not in current
+        ]
+        updated = []
+        for ingredient_id, amount in new.items():
+            item = current.get(ingredient_id)
+            if item is not None and item.amount != amount:
+                item.amount = amount
+                updated.append(item)
+        removed = [
+            item.id for ingredient_id, item in current.items()
+            if ingredient_id not in new
+        ]
+        IngredientInRecipe.objects.bulk_create(created)
+        IngredientInRecipe.objects.bulk_update(updated, ('amount',))
+        if removed:
+            IngredientInRecipe.objects.filter(id__in=removed).delete()
+        return bool(created or updated or removed)
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredient_recipes', None)
+        image = validated_data.pop('image', None)
+        changed = image is not None
+        if image is not None:
+            reset_variants(instance)
+            instance.image = image
+        if tags is not None:
+            changed |= RecipeSerializerPost._update_tags(tags, instance)
+        if ingredients is not None and (
+            RecipeSerializerPost._update_ingredients(ingredients, instance)
+        ):
+            recipe_ingredients_changed.send(
+                sender=Recipe, instance=instance, using=instance._state.db)
+            changed = True
+        for field, value in validated_data.items():
+            if getattr(instance, field) != value:
+                setattr(instance, field, value)
+                changed = True
+        if changed:
+            instance.save()
+        if image is not None:
+            schedule_image_processing(instance.id)
+        return instance
 
 
 class AuthorRecipeSerializer(ModelSerializer):
+    image = RecipeImageField(variant='thumbnail')
 
     class Meta:
         model = Recipe
@@ -225,6 +306,14 @@ class FavoriteSerializer(Serializer):
     image = Base64ImageField(max_length=None, use_url=False,)
 
 
+class RecipeIdsSerializer(Serializer):
+    recipes = ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_RECIPES_LIMIT,
+    )
+
+
 class FollowSerializer(ModelSerializer,
                        UserSerializer, CommonCount):
     recipes = SerializerMethodField()
@@ -235,9 +324,5 @@ class FollowSerializer(ModelSerializer,
                   'last_name', 'is_subscribed', 'recipes', 'recipes_count')
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        queryset = Recipe.objects.filter(author__id=obj.id)
-        if request.GET.get('recipes_limit'):
-            recipes_limit = int(request.GET.get('recipes_limit'))
-            queryset = queryset[:recipes_limit]
-        return AuthorRecipeSerializer(queryset, many=True).data
+        """Рецепты, загруженные ``FollowViewSet.prefetch_recipes``."""
+        return AuthorRecipeSerializer(obj.latest_recipes, many=True).data
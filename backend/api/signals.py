@@ -0,0 +1,171 @@
+from django.db.models.signals import (m2m_changed, post_delete,
+                                      post_migrate, post_save, pre_delete)
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from api.cache import invalidate_object, invalidate_resource
+from api.cart import rebuild_cart_ingredients, recipe_cart_rebuilds
+from api.counters import (followers_count_recounts, recipe_counter_recounts,
+                          recipes_count_recounts)
+from api.indexes import ingredient_index, recipe_ingredient_index
+from api.metrics import profile_query
+from api.similarity import similar_updates
+from api.search import (create_search_indexes, schedule_search_update,
+                        update_search_vectors)
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart, SimilarRecipe, Tag,
+                            TagInRecipe)
+from recipes.signals import catalogue_loaded, recipe_ingredients_changed
+from users.models import Follower, User
+
+USER_PUBLIC_FIELDS = {'username', 'email', 'first_name', 'last_name'}
+
+
+@receiver(connection_created)
+def attach_query_profiler(connection, **kwargs):
+    if profile_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(profile_query)
+
+
+@receiver(catalogue_loaded, sender=Ingredient)
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(recipe_ingredients_changed)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_recipe_ingredient_index(**kwargs):
+    transaction.on_commit(recipe_ingredient_index.invalidate)
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_recipe_ingredient_index_on_create(created, **kwargs):
+    # Индекс хранит только состав и список id рецептов, поэтому правка
+    # полей рецепта его не меняет.
+    if created:
+        invalidate_recipe_ingredient_index()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_responses(**kwargs):
+    invalidate_resource('ingredients')
+    invalidate_resource('recipes')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tag_responses(**kwargs):
+    invalidate_resource('tags')
+    invalidate_resource('recipes')
+
+
+@receiver(catalogue_loaded, sender=Ingredient)
+def invalidate_loaded_ingredient_responses(**kwargs):
+    invalidate_resource('ingredients')
+
+
+@receiver(catalogue_loaded, sender=Tag)
+def invalidate_loaded_tag_responses(**kwargs):
+    invalidate_resource('tags')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe_responses(instance, **kwargs):
+    invalidate_object('recipes', instance.pk)
+
+
+@receiver(m2m_changed, sender=TagInRecipe)
+def invalidate_recipe_tags_responses(instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        invalidate_resource('recipes')
+    else:
+        invalidate_object('recipes', instance.pk)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(update_fields, **kwargs):
+    if update_fields is None or USER_PUBLIC_FIELDS & set(update_fields):
+        invalidate_resource('recipes')
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(instance, using, **kwargs):
+    schedule_search_update(instance.pk, using)
+
+
+@receiver(pre_delete, sender=Ingredient)
+def update_ingredient_recipes(instance, using, **kwargs):
+    # Строки состава удаляются каскадом без сигналов.
+    for recipe_id in IngredientInRecipe.objects.using(using).filter(
+        ingredient=instance
+    ).values_list('recipe_id', flat=True):
+        schedule_search_update(recipe_id, using)
+        similar_updates.add(recipe_id, using)
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_recipes_search_vector(instance, using, created,
+                                            **kwargs):
+    if not created:
+        update_search_vectors(
+            Recipe.objects.db_manager(using).filter(ingredients=instance))
+
+
+@receiver(post_migrate)
+def create_recipe_search_indexes(sender, using, **kwargs):
+    if sender.label == 'recipes':
+        create_search_indexes(using)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_similar(instance, using, **kwargs):
+    similar_updates.add(instance.pk, using)
+
+
+@receiver(pre_delete, sender=Recipe)
+def update_deleted_recipe_similar(instance, using, **kwargs):
+    # Ссылки на рецепт удаляются каскадом, поэтому рецепты, у которых
+    # он был среди соседей, запоминаются до удаления.
+    for recipe_id in SimilarRecipe.objects.using(using).filter(
+        similar=instance
+    ).values_list('recipe_id', flat=True):
+        similar_updates.add(recipe_id, using)
+
+
+@receiver(recipe_ingredients_changed)
+def rebuild_recipe_carts(instance, using, **kwargs):
+    recipe_cart_rebuilds.add(instance.pk, using)
+
+
+@receiver(pre_delete, sender=Recipe)
+def rebuild_deleted_recipe_carts(instance, using, **kwargs):
+    user_ids = list(ShoppingCart.objects.using(using).filter(
+        recipe=instance).values_list('user_id', flat=True))
+    if user_ids:
+        transaction.on_commit(
+            lambda: rebuild_cart_ingredients(user_ids, using), using=using)
+
+
+@receiver(post_delete, sender=Recipe)
+def recount_author_recipes(instance, using, **kwargs):
+    recipes_count_recounts.add(instance.author_id, using)
+
+
+@receiver(pre_delete, sender=User)
+def recount_deleted_user_counters(instance, using, **kwargs):
+    # Избранное, корзина и подписки пользователя удаляются каскадом без
+    # сигналов; счётчики рецептов и авторов пересчитываются после
+    # фиксации.
+    for model in (Favorite, ShoppingCart):
+        for recipe_id in model.objects.using(using).filter(
+            user=instance
+        ).values_list('recipe_id', flat=True):
+            recipe_counter_recounts.add(recipe_id, using)
+    for author_id in Follower.objects.using(using).filter(
+        user=instance
+    ).values_list('following_id', flat=True):
+        followers_count_recounts.add(author_id, using)
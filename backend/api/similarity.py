@@ -0,0 +1,132 @@
+from collections import Counter, defaultdict
+from heapq import nlargest
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+
+from api.batching import CommitBatch
+from recipes.models import IngredientInRecipe, SimilarRecipe, TagInRecipe
+
+
+def load_features(recipes=None, using='default'):
+    """Признаки рецептов: ингредиенты и теги.
+
+    Возвращает признаки каждого рецепта и списки рецептов по
+    ингредиентам, по которым подбираются кандидаты.
+    """
+    ingredients = IngredientInRecipe.objects.using(using).order_by()
+    tags = TagInRecipe.objects.using(using).order_by()
+    if recipes is not None:
+        ingredients = ingredients.filter(recipe_id__in=recipes)
+        tags = tags.filter(recipe_id__in=recipes)
+    features = defaultdict(set)
+    postings = defaultdict(list)
+    for recipe_id, ingredient_id in ingredients.values_list(
+        'recipe_id', 'ingredient_id'
+    ).iterator():
+        features[recipe_id].add(('ingredient', ingredient_id))
+        postings[ingredient_id].append(recipe_id)
+    for recipe_id, tag_id in tags.values_list(
+        'recipe_id', 'tag_id'
+    ).iterator():
+        if recipe_id in features:
+            features[recipe_id].add(('tag', tag_id))
+    return features, postings
+
+
+def jaccard(first, second):
+    common = len(first & second)
+    return common / (len(first) + len(second) - common)
+
+
+def nearest(recipe_id, features, postings, limit):
+    """Ближайшие рецепты по мере Жаккара среди тех, у кого есть хотя бы
+    один общий ингредиент."""
+    own = features[recipe_id]
+    candidates = Counter()
+    for kind, pk in own:
+        if kind == 'ingredient':
+            candidates.update(postings[pk])
+    candidates.pop(recipe_id, None)
+    return nlargest(
+        limit,
+        ((jaccard(own, features[other]), other) for other in candidates),
+    )
+
+
+@transaction.atomic
+def rebuild_similar(batch_size=1000):
+    """Полный пересчёт таблицы похожих рецептов."""
+    features, postings = load_features()
+    limit = settings.SIMILAR_RECIPES_LIMIT
+    SimilarRecipe.objects.all().delete()
+    entries = (
+        SimilarRecipe(recipe_id=recipe_id, similar_id=other, score=score)
+        for recipe_id in features
+        for score, other in nearest(recipe_id, features, postings, limit)
+    )
+    created = 0
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == batch_size:
+            SimilarRecipe.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    SimilarRecipe.objects.bulk_create(batch)
+    return created + len(batch)
+
+
+def update_similar(recipe_ids, using='default'):
+    """Пересчитывает соседей изменённых рецептов.
+
+    Заново строятся списки самих рецептов и тех, у кого они были среди
+    соседей: иначе после удаления обратной ссылки в их топе осталось бы
+    меньше записей. В списки остальных кандидатов рецепт добавляется,
+    если попадает в их топ; лишние записи, которые при этом могут
+    остаться, убирает полный пересчёт.
+    """
+    limit = settings.SIMILAR_RECIPES_LIMIT
+    with transaction.atomic(using=using):
+        entries = SimilarRecipe.objects.using(using)
+        affected = set(recipe_ids).union(entries.filter(
+            similar_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True))
+        own, _ = load_features(affected, using)
+        ingredient_ids = {
+            pk for recipe_features in own.values()
+            for kind, pk in recipe_features if kind == 'ingredient'
+        }
+        candidates = IngredientInRecipe.objects.using(using).filter(
+            ingredient_id__in=ingredient_ids
+        ).values('recipe_id')
+        features, postings = load_features(candidates, using)
+        entries.filter(recipe_id__in=affected).delete()
+        forward = {
+            (recipe_id, other): score
+            for recipe_id in own
+            for score, other in nearest(recipe_id, features, postings, limit)
+        }
+        tops = {
+            row['recipe_id']: row
+            for row in entries.filter(recipe_id__in={
+                other for _, other in forward
+            }).values('recipe_id').annotate(
+                count=Count('id'), min_score=Min('score')
+            ).order_by()
+        }
+        backward = {}
+        for (recipe_id, other), score in forward.items():
+            if recipe_id not in recipe_ids or other in own:
+                continue
+            top = tops.get(other, {'count': 0, 'min_score': 0})
+            if top['count'] < limit or top['min_score'] < score:
+                backward[(other, recipe_id)] = score
+        entries.bulk_create(
+            SimilarRecipe(recipe_id=recipe_id, similar_id=other, score=score)
+            for (recipe_id, other), score in {**backward, **forward}.items()
+        )
+
+
+similar_updates = CommitBatch(update_similar)
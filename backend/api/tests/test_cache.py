@@ -0,0 +1,50 @@
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from api.cache import (VERSION_KEY, bump_version, get_cache, get_versions,
+                       invalidate_resource)
+
+DATABASE_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'api_cache',
+    },
+}
+
+
+@override_settings(CACHES=DATABASE_CACHES)
+class VersionTests(TestCase):
+    """Версии кэша ответов не истекают и не повторяются."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('createcachetable', verbosity=0)
+
+    def test_bump_is_stored_without_expiry(self):
+        bump_version('recipes')
+        cache = get_cache()
+        key = cache.make_key(VERSION_KEY.format('recipes'))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT expires FROM api_cache WHERE cache_key = %s', [key])
+            expires = cursor.fetchone()[0]
+        self.assertEqual(str(expires)[:4], '9999')
+
+    def test_evicted_version_is_not_reused(self):
+        first = get_versions(('recipes',))
+        self.assertEqual(get_versions(('recipes',)), first)
+        bump_version('recipes')
+        second = get_versions(('recipes',))
+        get_cache().delete(VERSION_KEY.format('recipes'))
+        third = get_versions(('recipes',))
+        self.assertEqual(len({first, second, third}), 3)
+
+    def test_invalidation_waits_for_commit(self):
+        before = get_versions(('tags',))
+        with self.captureOnCommitCallbacks() as callbacks:
+            invalidate_resource('tags')
+            self.assertEqual(get_versions(('tags',)), before)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_versions(('tags',)), before)
@@ -0,0 +1,96 @@
+from http import HTTPStatus
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.cart import rebuild_cart_ingredients
+from recipes.models import (CartIngredient, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingCart)
+from users.models import User
+
+CART_URL = '/api/recipes/shopping_cart/'
+
+
+class CartTests(TestCase):
+    """Массовые операции с корзиной и порции поддерживают сумму
+    ингредиентов такой же, как при полной пересборке."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com',
+            first_name='Покупатель', last_name='Покупателев',
+        )
+        carrot, cabbage = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Морковь', 'Капуста')
+        )
+        cls.recipes = []
+        for name, items in (
+            ('Суп', ((carrot, 100), (cabbage, 300))),
+            ('Салат', ((carrot, 50),)),
+        ):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=name, image='recipes/image/recipe.png',
+                text='Описание', cooking_time=10,
+            )
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=amount)
+                for ingredient, amount in items
+            )
+            cls.recipes.append(recipe.id)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def totals(self):
+        response = self.client.get(CART_URL)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        totals = {item['name']: item['amount'] for item in response.data}
+        rebuild_cart_ingredients([self.user.id])
+        self.assertEqual(totals, dict(CartIngredient.objects.values_list(
+            'ingredient__name', 'amount')))
+        return totals
+
+    def test_bulk_add_servings_and_remove(self):
+        for _ in '12':
+            response = self.client.post(
+                CART_URL, {'recipes': self.recipes}, format='json')
+            self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(self.totals(), {'Морковь': 150, 'Капуста': 300})
+        response = self.client.patch(
+            f'/api/recipes/{self.recipes[0]}/shopping_cart/',
+            {'servings': 2}, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(self.totals(), {'Морковь': 250, 'Капуста': 600})
+        response = self.client.delete(
+            CART_URL, {'recipes': self.recipes[:1]}, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        self.assertEqual(self.totals(), {'Морковь': 50})
+
+    def test_clear(self):
+        self.client.post(CART_URL, {'recipes': self.recipes}, format='json')
+        response = self.client.delete(CART_URL)
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        self.assertFalse(ShoppingCart.objects.exists())
+        self.assertEqual(self.totals(), {})
+        self.assertEqual(
+            list(Recipe.objects.values_list('carts_count', flat=True)),
+            [0, 0],
+        )
+
+    def test_servings_of_missing_recipe(self):
+        response = self.client.patch(
+            f'/api/recipes/{self.recipes[0]}/shopping_cart/',
+            {'servings': 2}, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertFalse(CartIngredient.objects.exists())
+
+    def test_invalid_bulk_request(self):
+        for data in ({'recipes': []}, {'recipes': [0]}, {}):
+            with self.subTest(data=data):
+                response = self.client.post(CART_URL, data, format='json')
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST)
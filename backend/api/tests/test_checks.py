@@ -0,0 +1,25 @@
+from django.test import SimpleTestCase, override_settings
+
+from api.checks import check_shared_cache
+
+DATABASE_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'api_cache',
+    },
+}
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+
+    @override_settings(CACHES=DATABASE_CACHES)
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_process_local_cache_is_rejected(self):
+        errors = check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['api.E001'])
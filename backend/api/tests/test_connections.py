@@ -0,0 +1,34 @@
+from unittest import mock, skipUnless
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import SimpleTestCase
+
+from foodgram.db import serving_requests
+from foodgram.db.base import DatabaseWrapper
+
+
+connection = connections[DEFAULT_DB_ALIAS]
+
+
+@skipUnless(isinstance(connection, DatabaseWrapper), 'Нужен бэкенд '
+                                                     'foodgram.db')
+class StatementTimeoutTests(SimpleTestCase):
+    """Таймаут запросов действует только в процессах, обслуживающих
+    HTTP-запросы."""
+
+    def setUp(self):
+        patcher = mock.patch.dict(
+            connection.settings_dict, {'STATEMENT_TIMEOUT': 500})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(serving_requests.clear)
+
+    def test_management_commands_have_no_timeout(self):
+        serving_requests.clear()
+        params = connection.get_connection_params()
+        self.assertNotIn('statement_timeout', params.get('options', ''))
+
+    def test_request_processes_have_timeout(self):
+        serving_requests.set()
+        params = connection.get_connection_params()
+        self.assertIn('-c statement_timeout=500', params['options'])
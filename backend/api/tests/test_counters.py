@@ -0,0 +1,59 @@
+from django.test import TestCase, override_settings
+
+from recipes.models import Favorite, Recipe, ShoppingCart, TimelineEntry
+from users.models import Follower, User
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        first_name='Имя', last_name='Фамилия',
+    )
+
+
+@override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+class CascadeCounterTests(TestCase):
+    """Счётчики остаются точными, когда строки удаляются каскадом или
+    мимо API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.readers = [create_user(f'reader{number}') for number in range(2)]
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт',
+            image='recipes/image/recipe.png', text='Описание',
+            cooking_time=10,
+        )
+        for reader in cls.readers:
+            Favorite.objects.create(user=reader, recipe=cls.recipe)
+            ShoppingCart.objects.create(user=reader, recipe=cls.recipe)
+            Follower.objects.create(user=reader, following=cls.author)
+        Recipe.objects.update(favorites_count=2, carts_count=2)
+        User.objects.filter(pk=cls.author.pk).update(
+            recipes_count=1, followers_count=2)
+
+    def test_user_deletion(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.readers[0].delete()
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(
+            (self.recipe.favorites_count, self.recipe.carts_count), (1, 1))
+        self.assertEqual(self.author.followers_count, 1)
+        # Автор опустился до порога: его рецепты разложены по лентам.
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user_id', 'recipe_id')),
+            [(self.readers[1].id, self.recipe.id)],
+        )
+
+    def test_recipe_deletion_outside_api(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+
+    def test_author_deletion(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.delete()
+        self.assertFalse(Recipe.objects.exists())
@@ -0,0 +1,101 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.http import FileResponse
+from django.test import TestCase, TransactionTestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework.throttling import UserRateThrottle
+
+from api.views import ShoppingCartDownloadView
+from recipes.models import CartIngredient, Ingredient
+from users.models import User
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+
+
+class SingleDownloadThrottle(UserRateThrottle):
+    rate = '1/min'
+
+
+def create_cart(username):
+    user = User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        first_name='Покупатель', last_name='Покупателев',
+    )
+    for name, amount in (('Морковь', 300), ('Капуста', 500)):
+        CartIngredient.objects.create(
+            user=user,
+            ingredient=Ingredient.objects.create(
+                name=name, measurement_unit='г'),
+            amount=amount,
+        )
+    return f'Token {Token.objects.create(user=user).key}'
+
+
+class DownloadTests(TestCase):
+    """Под WSGI список покупок отдаётся потоком из курсора."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authorization = create_cart('buyer')
+
+    def setUp(self):
+        self.client = APIClient(HTTP_AUTHORIZATION=self.authorization)
+
+    def test_streams_shopping_list(self):
+        response = self.client.get(DOWNLOAD_URL, {'format': 'txt'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        self.assertNotIsInstance(response, FileResponse)
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename=shopping_cart.txt',
+        )
+        content = b''.join(response.streaming_content).decode()
+        self.assertLess(content.index('Капуста'), content.index('Морковь'))
+
+    def test_anonymous_is_rejected(self):
+        response = APIClient().get(DOWNLOAD_URL)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+    def test_unknown_format(self):
+        response = self.client.get(DOWNLOAD_URL, {'format': 'xml'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class AsyncDownloadTests(TransactionTestCase):
+    """Под ASGI файл собирается в рабочем потоке, проверки DRF
+    сохраняются."""
+
+    def setUp(self):
+        self.authorization = create_cart('async-buyer')
+
+    async def test_builds_file(self):
+        response = await self.async_client.get(
+            DOWNLOAD_URL, {'format': 'csv'},
+            authorization=self.authorization,
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIsInstance(response, FileResponse)
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        self.assertIn('Морковь', content)
+
+    async def test_anonymous_is_rejected(self):
+        response = await self.async_client.get(DOWNLOAD_URL)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    async def test_throttled(self):
+        with mock.patch.object(
+            ShoppingCartDownloadView, 'throttle_classes',
+            (SingleDownloadThrottle,),
+        ):
+            statuses = [
+                (await self.async_client.get(
+                    DOWNLOAD_URL, authorization=self.authorization
+                )).status_code
+                for _ in range(2)
+            ]
+        self.assertEqual(
+            statuses, [HTTPStatus.OK, HTTPStatus.TOO_MANY_REQUESTS])
@@ -0,0 +1,115 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.feed import fan_out
+from recipes.models import Recipe, TimelineEntry
+from users.models import User
+
+
+@override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+class FeedTests(TestCase):
+    """Лента сливает разложенные записи и рецепты популярных авторов и
+    перестраивается, когда автор пересекает порог раскладки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.readers = [
+            cls.create_user(f'reader{number}') for number in range(2)]
+        cls.author = cls.create_user('author')
+        cls.star = cls.create_user('star')
+
+    @staticmethod
+    def create_user(username):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            first_name='Имя', last_name='Фамилия',
+        )
+
+    def setUp(self):
+        self.clients = []
+        for reader in self.readers:
+            client = APIClient()
+            client.force_authenticate(reader)
+            self.clients.append(client)
+
+    def subscribe(self, number, author):
+        response = self.clients[number].post(
+            f'/api/users/{author.id}/subscribe/')
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def unsubscribe(self, number, author):
+        response = self.clients[number].delete(
+            f'/api/users/{author.id}/subscribe/')
+        self.assertEqual(response.status_code, 204)
+
+    def publish(self, author, name):
+        author.refresh_from_db()
+        recipe = Recipe.objects.create(
+            author=author, name=name, image='recipes/image/recipe.png',
+            text='Описание', cooking_time=10,
+        )
+        fan_out(recipe)
+        return recipe.id
+
+    def feed(self, number, **params):
+        response = self.clients[number].get('/api/recipes/feed/', params)
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def entries(self, author):
+        return set(TimelineEntry.objects.filter(
+            recipe__author=author).values_list('user_id', 'recipe_id'))
+
+    def test_merges_fanned_out_and_pulled_authors(self):
+        self.subscribe(0, self.author)
+        self.subscribe(0, self.star)
+        self.subscribe(1, self.star)
+        ids = [
+            self.publish(author, f'Рецепт {number}')
+            for number, author in enumerate(
+                (self.author, self.star, self.author, self.star))
+        ]
+        self.assertEqual(
+            self.entries(self.author),
+            {(self.readers[0].id, ids[0]), (self.readers[0].id, ids[2])},
+        )
+        self.assertEqual(self.entries(self.star), set())
+        self.assertEqual(self.feed(0), ids[::-1])
+        self.assertEqual(self.feed(1), [ids[3], ids[1]])
+
+    def test_pages_do_not_repeat_or_skip(self):
+        self.subscribe(0, self.author)
+        self.subscribe(0, self.star)
+        self.subscribe(1, self.star)
+        ids = [
+            self.publish((self.author, self.star)[number % 2], str(number))
+            for number in range(5)
+        ]
+        response = self.clients[0].get('/api/recipes/feed/', {'limit': 2})
+        pages = [[recipe['id'] for recipe in response.data['results']]]
+        while response.data['next']:
+            response = self.clients[0].get(response.data['next'])
+            pages.append([recipe['id'] for recipe in response.data['results']])
+        self.assertEqual(sum(pages, []), ids[::-1])
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+
+    def test_author_falling_below_threshold_is_fanned_out(self):
+        self.subscribe(0, self.star)
+        self.subscribe(1, self.star)
+        ids = [self.publish(self.star, str(number)) for number in range(2)]
+        self.assertEqual(self.entries(self.star), set())
+        self.unsubscribe(1, self.star)
+        self.assertEqual(
+            self.entries(self.star),
+            {(self.readers[0].id, recipe_id) for recipe_id in ids},
+        )
+        self.assertEqual(self.feed(0), ids[::-1])
+        self.assertEqual(self.feed(1), [])
+
+    def test_author_rising_above_threshold_is_pulled(self):
+        self.subscribe(0, self.author)
+        ids = [self.publish(self.author, str(number)) for number in range(2)]
+        self.subscribe(1, self.author)
+        self.assertEqual(self.entries(self.author), set())
+        self.assertEqual(self.feed(0), ids[::-1])
+        self.assertEqual(self.feed(1), ids[::-1])
@@ -0,0 +1,77 @@
+from base64 import b64encode
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.fields import BASE64_CHUNK_SIZE, RecipeImageUploadField
+
+
+def make_image(size, image_format='PNG'):
+    buffer = BytesIO()
+    Image.effect_noise(size, 64).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def data_uri(content):
+    return 'data:image/png;base64,' + b64encode(content).decode()
+
+
+class RecipeImageUploadFieldTests(SimpleTestCase):
+    """Изображение рецепта принимается строкой base64 и файлом в
+    пределах ограничений размера и числа пикселей."""
+
+    def setUp(self):
+        self.field = RecipeImageUploadField()
+
+    def assert_fails(self, data, code):
+        with self.assertRaises(ValidationError) as context:
+            self.field.to_internal_value(data)
+        self.assertEqual(context.exception.detail[0].code, code)
+
+    def test_decodes_across_chunks_with_whitespace(self):
+        content = make_image((400, 400))
+        encoded = b64encode(content).decode()
+        self.assertGreater(len(encoded), 2 * BASE64_CHUNK_SIZE)
+        # Перенос каждые 77 символов сдвигает четвёрки относительно
+        # границ блоков.
+        wrapped = '\n'.join(
+            encoded[start:start + 77]
+            for start in range(0, len(encoded), 77)
+        )
+        file = self.field.to_internal_value(
+            'data:image/png;base64,' + wrapped)
+        self.assertEqual(file.read(), content)
+        self.assertTrue(file.name.endswith('.png'))
+
+    def test_accepts_plain_base64_and_uploaded_file(self):
+        content = make_image((8, 8), 'JPEG')
+        file = self.field.to_internal_value(b64encode(content).decode())
+        self.assertTrue(file.name.endswith('.jpg'))
+        file = self.field.to_internal_value(
+            SimpleUploadedFile('image.jpg', content))
+        self.assertTrue(file.name.endswith('.jpg'))
+
+    def test_rejects_invalid_base64(self):
+        self.assert_fails('data:image/png;base64,abc', 'invalid_image')
+        self.assert_fails('data:image/png;base64,ab$d', 'invalid_image')
+        self.assert_fails(
+            data_uri(b'not an image at all'), 'invalid_image')
+
+    def test_rejects_large_file(self):
+        content = make_image((64, 64))
+        with override_settings(RECIPE_IMAGE_MAX_SIZE=len(content) - 1):
+            self.assert_fails(data_uri(content), 'max_size')
+            self.assert_fails(
+                SimpleUploadedFile('image.png', content), 'max_size')
+        with override_settings(RECIPE_IMAGE_MAX_SIZE=len(content)):
+            self.field.to_internal_value(data_uri(content))
+
+    def test_rejects_too_many_pixels(self):
+        content = make_image((50, 50))
+        with override_settings(RECIPE_IMAGE_MAX_PIXELS=2499):
+            self.assert_fails(data_uri(content), 'max_pixels')
+        with override_settings(RECIPE_IMAGE_MAX_PIXELS=2500):
+            self.field.to_internal_value(data_uri(content))
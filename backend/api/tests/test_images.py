@@ -0,0 +1,76 @@
+import shutil
+import tempfile
+from base64 import b64encode
+from http import HTTPStatus
+from io import BytesIO
+
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT, IMAGE_PROCESSING_BACKEND='sync',
+    RECIPE_THUMBNAIL_SIZE=(40, 40), RECIPE_IMAGE_WEBP_SIZE=(100, 100),
+)
+class ImagePipelineTests(TestCase):
+    """После фиксации загрузки строятся миниатюра и WebP-версия, список
+    отдаёт миниатюру, а до обработки — оригинал."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов',
+        )
+        cls.tag = Tag.objects.create(
+            name='Обед', slug='lunch', color='#000000')
+        cls.ingredient = Ingredient.objects.create(
+            name='Морковь', measurement_unit='г')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self):
+        buffer = BytesIO()
+        Image.new('RGB', (400, 200), 'orange').save(buffer, 'PNG')
+        image = b64encode(buffer.getvalue()).decode()
+        return self.client.post('/api/recipes/', {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+            'image': f'data:image/png;base64,{image}',
+            'tags': [self.tag.id],
+            'ingredients': [{'id': self.ingredient.id, 'amount': 10}],
+        }, format='json')
+
+    def test_variants_are_built_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.create_recipe()
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        recipe = Recipe.objects.get()
+        self.assertFalse(recipe.thumbnail)
+        self.assertTrue(
+            self.client.get('/api/recipes/').data['results'][0][
+                'image'].endswith(recipe.image.name))
+        for callback in callbacks:
+            callback()
+        recipe.refresh_from_db()
+        for variant, size in (
+            (recipe.thumbnail, (40, 20)), (recipe.image_webp, (100, 50)),
+        ):
+            with variant.open('rb') as file, Image.open(file) as image:
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(image.size, size)
+        self.assertTrue(
+            self.client.get('/api/recipes/').data['results'][0][
+                'image'].endswith(recipe.thumbnail.name))
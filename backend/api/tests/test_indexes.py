@@ -0,0 +1,80 @@
+from django.test import TestCase
+
+from api.indexes import recipe_ingredient_index
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from recipes.signals import recipe_ingredients_changed
+from users.models import User
+
+
+class RecipeIngredientIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов',
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(4)
+        ]
+        cls.recipes = {}
+        for name, ingredients in (
+            ('two', (0, 1)),
+            ('unrelated', (2,)),
+            ('empty', ()),
+            ('three', (0, 2, 3)),
+        ):
+            recipe = Recipe.objects.create(
+                author=author, name=name, image='recipes/image/recipe.png',
+                text='Описание', cooking_time=10,
+            )
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe,
+                    ingredient=cls.ingredients[number],
+                    amount=100,
+                )
+                for number in ingredients
+            )
+            cls.recipes[name] = recipe.id
+
+    def setUp(self):
+        recipe_ingredient_index.invalidate()
+
+    def search(self, pantry, max_missing):
+        return recipe_ingredient_index.search(
+            pantry=[self.ingredients[number].id for number in pantry],
+            max_missing=max_missing,
+        )
+
+    def test_pantry_includes_recipes_without_overlap(self):
+        self.assertEqual(self.search((0,), 1), [
+            self.recipes['empty'],
+            self.recipes['unrelated'],
+            self.recipes['two'],
+        ])
+
+    def test_pantry_without_missing(self):
+        self.assertEqual(self.search((0, 1), 0), [
+            self.recipes['empty'],
+            self.recipes['two'],
+        ])
+
+    def test_pantry_allows_all_missing(self):
+        self.assertEqual(
+            sorted(self.search((0,), 3)), sorted(self.recipes.values()))
+
+    def test_only_ingredient_changes_invalidate(self):
+        recipe = Recipe.objects.get(id=self.recipes['two'])
+        generation = recipe_ingredient_index._generation
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.name = 'Переименован'
+            recipe.save()
+        self.assertEqual(recipe_ingredient_index._generation, generation)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe_ingredients_changed.send(
+                sender=Recipe, instance=recipe, using='default')
+        self.assertEqual(
+            recipe_ingredient_index._generation, generation + 1)
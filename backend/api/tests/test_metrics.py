@@ -0,0 +1,42 @@
+from http import HTTPStatus
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from users.models import User
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class MetricsViewTests(TestCase):
+    """Метрики отдаются в формате экспозиции Prometheus при любом
+    заголовке Accept."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='secret',
+            first_name='Админ', last_name='Админов',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_content_type(self):
+        for accept in (
+            '*/*',
+            'text/plain',
+            'application/openmetrics-text;version=1.0.0,'
+            'text/plain;version=0.0.4;q=0.5,*/*;q=0.1',
+        ):
+            with self.subTest(accept=accept):
+                response = self.client.get(
+                    '/api/metrics/', HTTP_ACCEPT=accept)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(
+                    response['Content-Type'], PROMETHEUS_CONTENT_TYPE)
+
+    def test_requires_admin(self):
+        response = APIClient().get('/api/metrics/')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
@@ -0,0 +1,55 @@
+from http import HTTPStatus
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.cache import get_cache
+from api.middleware import get_pin_key
+from users.models import User
+
+REPLICA_DATABASES = {
+    **settings.DATABASES,
+    'replica': {
+        **settings.DATABASES['default'],
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'api_cache',
+    },
+}
+
+
+@override_settings(DATABASES=REPLICA_DATABASES, CACHES=DATABASE_CACHES)
+class ReplicaMiddlewareAsyncTests(TestCase):
+    """Под ASGI закрепление за основной базой читается и пишется в кэш
+    в базе не из цикла событий."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('createcachetable', verbosity=0)
+        user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читателев',
+        )
+        cls.authorization = f'Token {Token.objects.create(user=user).key}'
+
+    async def test_authenticated_read(self):
+        response = await self.async_client.get(
+            '/api/recipes/', authorization=self.authorization)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    async def test_write_pins_to_primary(self):
+        await self.async_client.post(
+            '/api/recipes/', {}, content_type='application/json',
+            authorization=self.authorization,
+        )
+        request = RequestFactory().get(
+            '/', HTTP_AUTHORIZATION=self.authorization)
+        pinned = await sync_to_async(get_cache().get)(get_pin_key(request))
+        self.assertIs(pinned, True)
@@ -0,0 +1,111 @@
+from http import HTTPStatus
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.filters import ORDERING_FIELDS
+from recipes.models import Recipe
+from users.models import Follower, User
+
+RECIPES_COUNT = 7
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        first_name='Имя', last_name='Фамилия',
+    )
+
+
+def create_recipe(author, number):
+    return Recipe.objects.create(
+        author=author, name=f'Рецепт {number}',
+        image='recipes/image/recipe.png', text='Описание',
+        cooking_time=number % 2 + 1,
+    )
+
+
+class CursorPaginationTests(TestCase):
+    """Keyset-пагинация проходит все записи без повторов и пропусков при
+    совпадающих ключах сортировки и при вставке новых записей."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        recipes = [
+            create_recipe(cls.user, number).id
+            for number in range(RECIPES_COUNT)
+        ]
+        # Совпадающие даты проверяют, что id разрешает ничьи.
+        Recipe.objects.filter(id__in=recipes[:4]).update(
+            pub_date=timezone.now())
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIsNone(response.data['count'])
+        return response.data
+
+    def walk(self, **params):
+        page = self.get('/api/recipes/', {
+            'pagination': 'cursor', 'limit': 2, **params})
+        ids = [recipe['id'] for recipe in page['results']]
+        while page['next']:
+            page = self.get(page['next'])
+            ids.extend(recipe['id'] for recipe in page['results'])
+        return ids
+
+    def test_walks_every_ordering(self):
+        for ordering, fields in ORDERING_FIELDS.items():
+            with self.subTest(ordering=ordering):
+                expected = list(Recipe.objects.order_by(
+                    *fields).values_list('id', flat=True))
+                self.assertEqual(self.walk(ordering=ordering), expected)
+
+    def test_insert_does_not_shift_pages(self):
+        first = self.get('/api/recipes/', {
+            'pagination': 'cursor', 'limit': 3})
+        create_recipe(self.user, RECIPES_COUNT)
+        second = self.get(first['next'])
+        seen = [recipe['id'] for recipe in first['results']]
+        rest = [recipe['id'] for recipe in second['results']]
+        self.assertFalse(set(seen) & set(rest))
+        self.assertEqual(
+            seen + rest,
+            list(Recipe.objects.exclude(
+                name=f'Рецепт {RECIPES_COUNT}'
+            ).order_by(*ORDERING_FIELDS['newest']).values_list(
+                'id', flat=True))[:6],
+        )
+
+    def test_previous_returns_same_page(self):
+        first = self.get('/api/recipes/', {
+            'pagination': 'cursor', 'limit': 3})
+        second = self.get(first['next'])
+        self.assertEqual(
+            self.get(second['previous'])['results'], first['results'])
+        self.assertIsNone(first['previous'])
+
+    def test_invalid_cursor(self):
+        for cursor in ('bad', 'MXx4fHk='):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    '/api/recipes/', {'cursor': cursor})
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_subscriptions(self):
+        authors = [create_user(f'author{number}') for number in range(5)]
+        Follower.objects.bulk_create(
+            Follower(user=self.user, following=author) for author in authors)
+        self.client.force_authenticate(self.user)
+        page = self.get('/api/users/subscriptions/', {
+            'pagination': 'cursor', 'limit': 2})
+        ids = [author['id'] for author in page['results']]
+        while page['next']:
+            page = self.get(page['next'])
+            ids.extend(author['id'] for author in page['results'])
+        self.assertEqual(ids, [author.id for author in authors])
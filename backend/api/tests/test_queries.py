@@ -0,0 +1,177 @@
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follower, User
+
+RECIPES_COUNT = 12
+DUMMY_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+DATABASE_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'api_cache',
+    },
+}
+
+
+@override_settings(CACHES=DUMMY_CACHES)
+class RecipeQueryCountTests(TestCase):
+    """Число SQL-запросов списка и карточки рецепта не зависит от
+    размера страницы. Кэш отключён, чтобы считались только запросы
+    представлений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читателев',
+        )
+        authors = [
+            User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                first_name='Автор', last_name=str(number),
+            )
+            for number in range(3)
+        ]
+        Follower.objects.create(user=cls.user, following=authors[0])
+        tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', slug=f'tag{number}',
+                color=f'#00000{number}',
+            )
+            for number in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(3)
+        ]
+        for number in range(RECIPES_COUNT):
+            recipe = Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {number}',
+                image='recipes/image/recipe.png',
+                text='Описание',
+                cooking_time=10,
+            )
+            recipe.tags.set(tags)
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=100)
+                for ingredient in ingredients
+            )
+            if number % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            if number % 3:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        cls.recipe = recipe
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.anon = APIClient()
+
+    def count_queries(self, client, path):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        for client in (self.client, self.anon):
+            with self.subTest(anonymous=client is self.anon):
+                small = self.count_queries(client, '/api/recipes/?limit=2')
+                large = self.count_queries(
+                    client, f'/api/recipes/?limit={RECIPES_COUNT}')
+                self.assertEqual(small, large)
+
+    # Авторизованный запрос дороже анонимного ровно на один запрос:
+    # избранное, корзина и подписки читаются одним UNION ALL.
+    def test_list_queries(self):
+        with self.assertNumQueries(5):
+            self.client.get(f'/api/recipes/?limit={RECIPES_COUNT}')
+        with self.assertNumQueries(4):
+            self.anon.get(f'/api/recipes/?limit={RECIPES_COUNT}')
+
+    def test_detail_queries(self):
+        path = f'/api/recipes/{self.recipe.id}/'
+        with self.assertNumQueries(4):
+            self.client.get(path)
+        with self.assertNumQueries(3):
+            self.anon.get(path)
+
+    def test_membership_flags(self):
+        response = self.client.get(f'/api/recipes/?limit={RECIPES_COUNT}')
+        for recipe in response.data['results']:
+            number = int(recipe['name'].split()[-1])
+            self.assertEqual(recipe['is_favorited'], bool(number % 2))
+            self.assertEqual(recipe['is_in_shopping_cart'], bool(number % 3))
+            self.assertEqual(
+                recipe['author']['is_subscribed'],
+                recipe['author']['username'] == 'author0',
+            )
+
+
+@override_settings(CACHES=DATABASE_CACHES)
+class RecipeUpdateQueryCountTests(TestCase):
+    """Правка состава рецепта стоит одинаково при любом числе удаляемых
+    ингредиентов. Кэш хранится в базе, как по умолчанию, поэтому его
+    запросы тоже учитываются."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('createcachetable', verbosity=0)
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов',
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(RECIPES_COUNT * 2)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def create_recipe(self, ingredients):
+        recipe = Recipe.objects.create(
+            author=self.author,
+            name=f'Рецепт из {len(ingredients)}',
+            image='recipes/image/recipe.png',
+            text='Описание',
+            cooking_time=10,
+        )
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe, ingredient=ingredient, amount=100)
+            for ingredient in ingredients
+        )
+        return recipe, ingredients[0]
+
+    def count_update_queries(self, recipe, kept):
+        data = {'ingredients': [{'id': kept.id, 'amount': 5}]}
+        with CaptureQueriesContext(connection) as context:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(
+                    f'/api/recipes/{recipe.id}/', data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return len(context)
+
+    def test_update_queries_do_not_depend_on_removed_ingredients(self):
+        # Составы не пересекаются, чтобы рецепты не стали похожими.
+        with self.captureOnCommitCallbacks(execute=True):
+            small = self.create_recipe(self.ingredients[:3])
+            large = self.create_recipe(self.ingredients[RECIPES_COUNT:])
+        self.assertEqual(
+            self.count_update_queries(*small),
+            self.count_update_queries(*large),
+        )
@@ -0,0 +1,40 @@
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.search import (SEARCH_INDEXES, TRIGRAM_INDEXES,
+                        create_search_indexes, has_trigram)
+from recipes.models import Recipe
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Индексы есть только в '
+                                               'PostgreSQL')
+class SearchIndexTests(TestCase):
+    """Индексы поиска создаются один раз и только там, куда идут
+    миграции."""
+
+    def indexes(self):
+        with connection.cursor() as cursor:
+            return connection.introspection.get_constraints(
+                cursor, Recipe._meta.db_table)
+
+    def test_repeated_call_runs_no_ddl(self):
+        indexes = SEARCH_INDEXES
+        if has_trigram('default'):
+            indexes += TRIGRAM_INDEXES
+        self.assertTrue({name for name, _ in indexes} <= set(self.indexes()))
+        with CaptureQueriesContext(connection) as context:
+            create_search_indexes('default')
+        self.assertFalse([
+            query['sql'] for query in context
+            if query['sql'].startswith('CREATE INDEX')
+        ])
+
+    @override_settings(
+        DATABASE_ROUTERS=['foodgram.db.router.ReplicaRouter'])
+    def test_replica_is_skipped(self):
+        with mock.patch('api.search.create_indexes') as create_indexes:
+            create_search_indexes('replica')
+        create_indexes.assert_not_called()
@@ -0,0 +1,60 @@
+from django.test import TestCase, override_settings
+
+from api.similarity import rebuild_similar, update_similar
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe,
+                            SimilarRecipe)
+from users.models import User
+
+
+@override_settings(SIMILAR_RECIPES_LIMIT=1)
+class UpdateSimilarTests(TestCase):
+    """Частичный пересчёт похожих рецептов совпадает с полным, в том
+    числе для рецептов, ссылавшихся на изменённый."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов',
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(3)
+        ]
+        cls.recipes = {}
+        for name, numbers in (('x', (0, 1)), ('y', (0, 1)), ('z', (0,))):
+            recipe = Recipe.objects.create(
+                author=author, name=name, image='recipes/image/recipe.png',
+                text='Описание', cooking_time=10,
+            )
+            cls.set_ingredients(recipe, numbers)
+            cls.recipes[name] = recipe
+        rebuild_similar()
+
+    @classmethod
+    def set_ingredients(cls, recipe, numbers):
+        IngredientInRecipe.objects.filter(recipe=recipe).delete()
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe, ingredient=cls.ingredients[number], amount=1)
+            for number in numbers
+        )
+
+    def neighbours(self):
+        return dict(SimilarRecipe.objects.values_list(
+            'recipe__name', 'similar__name'))
+
+    def test_referrers_are_recomputed(self):
+        self.assertEqual(self.neighbours()['y'], 'x')
+        self.set_ingredients(self.recipes['x'], (2,))
+        update_similar({self.recipes['x'].id})
+        updated = self.neighbours()
+        self.assertEqual(updated['y'], 'z')
+        rebuild_similar()
+        self.assertEqual(updated, self.neighbours())
+
+    def test_deleted_recipe_referrers_are_recomputed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes['x'].delete()
+        self.assertEqual(self.neighbours(), {'y': 'z', 'z': 'y'})
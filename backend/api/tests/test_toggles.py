@@ -0,0 +1,100 @@
+from http import HTTPStatus
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follower, User
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        first_name='Имя', last_name='Фамилия',
+    )
+
+
+class ToggleTests(TestCase):
+    """Повторное добавление и удаление возвращают 400 и 404, а не 500,
+    и не сбивают счётчики."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.author = create_user('author')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт',
+            image='recipes/image/recipe.png', text='Описание',
+            cooking_time=10,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_recipe_toggles(self):
+        for path, model, counter in (
+            ('favorite', Favorite, 'favorites_count'),
+            ('shopping_cart', ShoppingCart, 'carts_count'),
+        ):
+            with self.subTest(path=path):
+                url = f'/api/recipes/{self.recipe.id}/{path}/'
+                statuses = [self.client.post(url).status_code for _ in '12']
+                self.assertEqual(
+                    statuses, [HTTPStatus.CREATED, HTTPStatus.BAD_REQUEST])
+                self.assertEqual(model.objects.count(), 1)
+                self.recipe.refresh_from_db()
+                self.assertEqual(getattr(self.recipe, counter), 1)
+                statuses = [
+                    self.client.delete(url).status_code for _ in '12']
+                self.assertEqual(
+                    statuses, [HTTPStatus.NO_CONTENT, HTTPStatus.NOT_FOUND])
+                self.recipe.refresh_from_db()
+                self.assertEqual(getattr(self.recipe, counter), 0)
+
+    def test_unknown_recipe(self):
+        response = self.client.post('/api/recipes/0/favorite/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.delete('/api/recipes/0/shopping_cart/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_subscribe_toggle(self):
+        url = f'/api/users/{self.author.id}/subscribe/'
+        statuses = [self.client.post(url).status_code for _ in '12']
+        self.assertEqual(
+            statuses, [HTTPStatus.CREATED, HTTPStatus.BAD_REQUEST])
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
+        statuses = [self.client.delete(url).status_code for _ in '12']
+        self.assertEqual(
+            statuses, [HTTPStatus.NO_CONTENT, HTTPStatus.NOT_FOUND])
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 0)
+        self.assertFalse(Follower.objects.exists())
+
+    def test_self_subscribe(self):
+        response = self.client.post(f'/api/users/{self.user.id}/subscribe/')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_favorite_bulk(self):
+        other = Recipe.objects.create(
+            author=self.author, name='Другой рецепт',
+            image='recipes/image/recipe.png', text='Описание',
+            cooking_time=10,
+        )
+        ids = [self.recipe.id, other.id]
+        for _ in '12':
+            response = self.client.post(
+                '/api/recipes/favorite/', {'recipes': ids}, format='json')
+            self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(Favorite.objects.count(), 2)
+        response = self.client.post(
+            '/api/recipes/favorite/', {'recipes': [0]}, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.client.delete('/api/recipes/favorite/')
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        self.assertFalse(Favorite.objects.exists())
+        self.assertEqual(
+            list(Recipe.objects.values_list('favorites_count', flat=True)),
+            [0, 0],
+        )
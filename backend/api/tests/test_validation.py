@@ -0,0 +1,70 @@
+from http import HTTPStatus
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.serializers import (NOT_INGREDIENT_VALIDATION_ERROR,
+                             UNIQUE_INGREDIENT_VALIDATION_ERROR)
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mP8z8DwHwAFBQIAX8jx0gAAAABJRU5ErkJggg=='
+)
+
+
+class IngredientValidationTests(TestCase):
+    """Состав рецепта проверяется одним запросом, ошибки указывают на
+    позиции неверных строк."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов',
+        )
+        cls.tag = Tag.objects.create(
+            name='Обед', slug='lunch', color='#000000')
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г').id
+            for number in range(20)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, ingredient_ids):
+        return self.client.post('/api/recipes/', {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+            'image': IMAGE, 'tags': [self.tag.id],
+            'ingredients': [
+                {'id': pk, 'amount': 10} for pk in ingredient_ids
+            ],
+        }, format='json')
+
+    def test_error_positions(self):
+        first, second = self.ingredients[:2]
+        response = self.post([first, 0, second, first])
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(list(response.data), ['ingredients'])
+        self.assertEqual(response.data['ingredients'], [
+            {},
+            {'id': [NOT_INGREDIENT_VALIDATION_ERROR]},
+            {},
+            {'id': [UNIQUE_INGREDIENT_VALIDATION_ERROR]},
+        ])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_queries_do_not_depend_on_ingredient_count(self):
+        counts = []
+        for ingredient_ids in (self.ingredients[:2], self.ingredients):
+            with CaptureQueriesContext(connection) as context:
+                response = self.post([*ingredient_ids, 0])
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+            counts.append(len(context))
+        self.assertEqual(counts[0], counts[1])
@@ -3,7 +3,8 @@ from rest_framework.authtoken import views
 from rest_framework.routers import DefaultRouter
 
 from api.views import (CreateUserView, FollowViewSet, IngredientViewSet,
-                       RecipeViewSet, TagViewSet)
+                       MetricsView, RecipeViewSet, TagViewSet,
+                       download_shopping_cart)
 
 app_name = 'api'
 
@@ -14,6 +15,9 @@ router_v1.register('recipes', RecipeViewSet, basename='recipes')
 router_v1.register('ingredients', IngredientViewSet, basename='ingredients')
 
 urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('recipes/download_shopping_cart/', download_shopping_cart,
+         name='download_shopping_cart'),
     path('users/<users_id>/subscribe/',
          FollowViewSet.as_view({'post': 'create',
                                 'delete': 'delete'}), name='subscribe'),
@@ -1,25 +1,126 @@
 from http import HTTPStatus
 
+from api.cart import apply_cart_delta, rebuild_cart_ingredients
+from api.counters import COUNTER_FIELDS, change_counter, recount_counter
 from api.serializers import AuthorRecipeSerializer
+from django.db import IntegrityError, connections, router, transaction
 from django.shortcuts import get_object_or_404
-from recipes.models import Recipe
+from recipes.models import Favorite, Recipe, ShoppingCart
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
 
+ALREADY_ADDED_ERRORS = {
+    Favorite: 'Рецепт уже в избранном',
+    ShoppingCart: 'Рецепт уже в списке покупок',
+}
+NOT_ADDED_ERRORS = {
+    Favorite: 'Рецепта нет в избранном',
+    ShoppingCart: 'Рецепта нет в списке покупок',
+}
+UNKNOWN_RECIPES_ERROR = 'Рецептов нет в базе: {}'
 
-def post_delete_favorite_shopping_cart(user, method, model, id):
-    recipe = get_object_or_404(Recipe, id=id)
+
+def insert_ignore(model, **values):
+    """INSERT ... ON CONFLICT DO NOTHING одной строки.
+
+    Возвращает True, если строка добавлена, и False, если она уже была.
+    """
+    instance = model(**values)
+    connection = connections[router.db_for_write(model)]
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key
+    ]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({}) ON CONFLICT DO NOTHING'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    params = [
+        field.get_db_prep_save(field.pre_save(instance, True), connection)
+        for field in fields
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount == 1
+
+
+def post_delete_favorite_shopping_cart(user, method, model, id, **fields):
+    """Добавляет рецепт в избранное или корзину и удаляет его оттуда.
+
+    Каждое изменение — один запрос: повторное добавление упирается
+    в ограничение уникальности и возвращает 400, удаление отсутствующей
+    записи — 404. Сумма ингредиентов корзины меняется на вклад рецепта.
+    """
+    counter = COUNTER_FIELDS[model]
     if method == 'POST':
-        model.objects.create(user=user, recipe=recipe)
+        recipe = get_object_or_404(Recipe, id=id)
+        try:
+            with transaction.atomic():
+                if not insert_ignore(
+                    model, user=user, recipe=recipe, **fields
+                ):
+                    raise ValidationError(
+                        {'errors': ALREADY_ADDED_ERRORS[model]})
+                change_counter(Recipe, recipe.id, counter, 1)
+                if model is ShoppingCart:
+                    apply_cart_delta(user.id, [recipe.id], 1)
+        except IntegrityError:
+            raise NotFound()
         serializer = AuthorRecipeSerializer(recipe)
         return Response(serializer.data, status=HTTPStatus.CREATED)
-    obj = get_object_or_404(model, user=user, recipe=recipe)
-    obj.delete()
+    with transaction.atomic():
+        if model is ShoppingCart:
+            apply_cart_delta(user.id, [id], -1)
+        deleted, _ = model.objects.filter(user=user, recipe_id=id).delete()
+        if not deleted:
+            raise NotFound(NOT_ADDED_ERRORS[model])
+        change_counter(Recipe, id, counter, -1)
+    return Response(status=HTTPStatus.NO_CONTENT)
+
+
+def bulk_add_recipes(user, model, ids):
+    """Добавляет несколько рецептов; уже добавленные пропускаются."""
+    recipes = list(Recipe.objects.filter(id__in=ids))
+    unknown = set(ids) - {recipe.id for recipe in recipes}
+    if unknown:
+        raise ValidationError({'recipes': [UNKNOWN_RECIPES_ERROR.format(
+            ', '.join(map(str, sorted(unknown))))]})
+    with transaction.atomic():
+        model.objects.bulk_create(
+            [model(user=user, recipe=recipe) for recipe in recipes],
+            ignore_conflicts=True,
+        )
+        recount_counter(Recipe, ids, COUNTER_FIELDS[model], model, 'recipe')
+        if model is ShoppingCart:
+            rebuild_cart_ingredients([user.id])
+    serializer = AuthorRecipeSerializer(recipes, many=True)
+    return Response(serializer.data, status=HTTPStatus.CREATED)
+
+
+def bulk_remove_recipes(user, model, ids=None):
+    """Удаляет перечисленные рецепты, а без списка — все."""
+    entries = model.objects.filter(user=user)
+    if ids is not None:
+        entries = entries.filter(recipe_id__in=ids)
+    with transaction.atomic():
+        removed = list(entries.values_list('recipe_id', flat=True))
+        if model is ShoppingCart and removed:
+            apply_cart_delta(user.id, removed, -1)
+        entries.filter(recipe_id__in=removed).delete()
+        recount_counter(
+            Recipe, removed, COUNTER_FIELDS[model], model, 'recipe')
     return Response(status=HTTPStatus.NO_CONTENT)
 
 
-def recipe_formation(ingredients):
-    return '\n'.join([
-        f'{ingredient["ingredient__name"]} - {ingredient["sum_amount"]}'
-        f'{ingredient["ingredient__measurement_unit"]}'
-        for ingredient in ingredients
-    ])
+def set_servings(user, id, servings):
+    """Меняет число порций рецепта в корзине и его вклад в сумму."""
+    with transaction.atomic():
+        apply_cart_delta(user.id, [id], -1)
+        if not ShoppingCart.objects.filter(
+            user=user, recipe_id=id
+        ).update(servings=servings):
+            raise NotFound(NOT_ADDED_ERRORS[ShoppingCart])
+        apply_cart_delta(user.id, [id], 1)
+    return Response({'id': int(id), 'servings': servings})
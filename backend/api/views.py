@@ -1,83 +1,276 @@
 from http import HTTPStatus
 
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_list_or_404, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections, transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
 from users.models import Follower, User
+from api.cache import CachedResponseMixin
+from api.cart import shopping_list_rows
+from api.counters import change_counter
 from api.filters import RecipeFilter, IngredientFilter
-from api.utils import post_delete_favorite_shopping_cart, recipe_formation
-from api.serializers import (FollowSerializer, IngredientSerializer,
+from api.exporters import SHOPPING_CART_RENDERERS, export_to_file
+from api.feed import (backfill, feed_sources, followers_changed,
+                      remove_author)
+from api.indexes import ingredient_index, recipe_ingredient_index
+from api.metrics import (MetricsContentNegotiation, PrometheusRenderer,
+                         ProfiledViewMixin, aggregator)
+from api.parsers import MultiPartJSONParser
+from api.paginators import (FeedPaginator, IdListPaginator,
+                            RecipePaginator, SubscriptionPaginator)
+from api.utils import (bulk_add_recipes, bulk_remove_recipes, insert_ignore,
+                       post_delete_favorite_shopping_cart, set_servings)
+from api.serializers import (AuthorRecipeSerializer, CartIngredientSerializer,
+                             FollowSerializer, IngredientSerializer,
+                             RecipeIdsSerializer, RecipeListSerializer,
                              RecipeSerializer, RecipeSerializerPost,
-                             TagSerializer, UserDetailSerializer)
-from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                             ServingsSerializer, TagSerializer,
+                             UserDetailSerializer)
+from recipes.models import (CartIngredient, Favorite, Ingredient, Recipe,
                             ShoppingCart, Tag)
 
+RECIPES_LIMIT_ERROR = 'Укажите целое число больше 0'
+INGREDIENT_IDS_ERROR = 'Укажите id ингредиентов целыми числами'
+MAX_MISSING_ERROR = 'Укажите целое число не меньше 0'
+SELF_FOLLOW_ERROR = 'Нельзя подписаться на самого себя'
+ALREADY_FOLLOWING_ERROR = 'Вы уже подписаны на этого автора'
+NOT_FOLLOWING_ERROR = 'Вы не подписаны на этого автора'
 
-class CreateUserView(UserViewSet):
+
+class CreateUserView(ProfiledViewMixin, UserViewSet):
     serializer_class = UserDetailSerializer
     queryset = User.objects.all()
 
 
-class FollowViewSet(ModelViewSet):
+class FollowViewSet(ProfiledViewMixin, ModelViewSet):
 
     serializer_class = FollowSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SubscriptionPaginator
 
     def get_queryset(self):
-        return get_list_or_404(User, following__user=self.request.user)
+        return User.objects.filter(following__user=self.request.user)
 
-    def create(self, request, *args, **kwargs):
+    def get_recipes_limit(self):
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return None
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            recipes_limit = 0
+        if recipes_limit < 1:
+            raise ValidationError({'recipes_limit': RECIPES_LIMIT_ERROR})
+        return recipes_limit
 
-        user_id = self.kwargs.get('users_id')
-        user = get_object_or_404(User, id=user_id)
-        Follower.objects.create(
-            user=request.user, following=user)
-        return Response(HTTPStatus.CREATED)
+    def prefetch_recipes(self, authors, recipes_limit):
+        """Загружает рецепты авторов одним запросом в ``latest_recipes``."""
+        if not authors:
+            return
+        recipes = Recipe.objects.filter(author__in=authors)
+        if recipes_limit is not None:
+            recipes = recipes.latest_by_author(recipes_limit)
+        prefetch_related_objects(authors, Prefetch(
+            'recipes', queryset=recipes, to_attr='latest_recipes'
+        ))
 
-    def delete(self, request, *args, **kwargs):
+    def list(self, request, *args, **kwargs):
+        recipes_limit = self.get_recipes_limit()
+        page = self.paginate_queryset(self.get_queryset())
+        self.prefetch_recipes(page, recipes_limit)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def create(self, request, *args, **kwargs):
+        recipes_limit = self.get_recipes_limit()
+        author = get_object_or_404(User, id=self.kwargs.get('users_id'))
+        if author == request.user:
+            raise ValidationError({'errors': SELF_FOLLOW_ERROR})
+        with transaction.atomic():
+            if not insert_ignore(
+                Follower, user=request.user, following=author
+            ):
+                raise ValidationError({'errors': ALREADY_FOLLOWING_ERROR})
+            change_counter(User, author.id, 'followers_count', 1)
+            author.followers_count = followers_changed(author.id, 1)
+            backfill(request.user, author)
+        self.prefetch_recipes([author], recipes_limit)
+        serializer = self.get_serializer(author)
+        return Response(serializer.data, status=HTTPStatus.CREATED)
 
+    def delete(self, request, *args, **kwargs):
         author_id = self.kwargs['users_id']
-        user_id = request.user.id
-        subscribe = get_object_or_404(
-            Follower, user__id=user_id, following__id=author_id)
-        subscribe.delete()
-        return Response(HTTPStatus.NO_CONTENT)
+        with transaction.atomic():
+            deleted, _ = Follower.objects.filter(
+                user=request.user, following_id=author_id).delete()
+            if not deleted:
+                raise NotFound(NOT_FOLLOWING_ERROR)
+            change_counter(User, author_id, 'followers_count', -1)
+            followers_changed(author_id, -1)
+            remove_author(request.user, author_id)
+        return Response(status=HTTPStatus.NO_CONTENT)
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ProfiledViewMixin, CachedResponseMixin,
+                 ReadOnlyModelViewSet):
+    cache_resource = 'tags'
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
     permission_classes = (AllowAny,)
     pagination_class = None
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(ProfiledViewMixin, CachedResponseMixin,
+                        ReadOnlyModelViewSet):
+    cache_resource = 'ingredients'
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
     permission_classes = [permissions.AllowAny]
-    filter_class = IngredientFilter
+    filterset_class = IngredientFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        try:
+            limit = int(request.query_params.get('limit', 0))
+        except ValueError:
+            limit = 0
+        limit = min(limit, settings.INGREDIENT_AUTOCOMPLETE_LIMIT)
+        return Response(ingredient_index.search(name, limit))
 
-class RecipeViewSet(ModelViewSet):
-    queryset = Recipe.objects.all()
+
+class RecipeViewSet(ProfiledViewMixin, CachedResponseMixin, ModelViewSet):
+    cache_resource = 'recipes'
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = RecipePaginator
     filterset_class = RecipeFilter
     filter_backends = [DjangoFilterBackend, ]
+    upload_actions = ('create', 'update', 'partial_update')
+    upload_parser_classes = (JSONParser, MultiPartJSONParser)
+    action_serializers = {
+        'list': RecipeListSerializer,
+        'feed': RecipeListSerializer,
+        'by_ingredients': RecipeListSerializer,
+        'similar': AuthorRecipeSerializer,
+        'shopping_cart_bulk': CartIngredientSerializer,
+    }
+
+    def initialize_request(self, request, *args, **kwargs):
+        """Создание и правка рецепта принимают JSON или multipart с
+        файлом изображения; остальные действия — парсеры по умолчанию."""
+        request = super().initialize_request(request, *args, **kwargs)
+        if self.action in self.upload_actions:
+            request.parsers = [
+                parser() for parser in self.upload_parser_classes
+            ]
+        return request
+
+    def get_queryset(self):
+        queryset = Recipe.objects.all()
+        if self.request.method == 'GET':
+            return queryset.with_related()
+        return queryset
 
     def get_serializer_class(self):
+        if self.action in self.action_serializers:
+            return self.action_serializers[self.action]
         if self.request.method == 'GET':
             return RecipeSerializer
         return RecipeSerializerPost
 
+    def serialize_page(self, ids):
+        """Загружает страницу рецептов по списку id, сохраняя порядок."""
+        recipes = Recipe.objects.with_related().in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=('get',),
+        pagination_class=FeedPaginator,
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        """Новые рецепты авторов, на которых подписан пользователь."""
+        return self.serialize_page(
+            self.paginate_queryset(feed_sources(request.user)))
+
+    def get_ingredient_ids(self, name):
+        try:
+            return [
+                int(value) for value in self.request.query_params.getlist(name)
+            ]
+        except ValueError:
+            raise ValidationError({name: INGREDIENT_IDS_ERROR})
+
+    def get_max_missing(self):
+        try:
+            max_missing = int(
+                self.request.query_params.get('max_missing', 0))
+        except ValueError:
+            max_missing = -1
+        if max_missing < 0:
+            raise ValidationError({'max_missing': MAX_MISSING_ERROR})
+        return max_missing
+
+    @action(
+        detail=False,
+        methods=('get',),
+        url_path='by_ingredients',
+        url_name='by_ingredients',
+        pagination_class=IdListPaginator,
+        permission_classes=[AllowAny]
+    )
+    def by_ingredients(self, request):
+        """Рецепты со всеми ``include``, без ``exclude``; с ``pantry`` —
+        те, для которых не хватает не больше ``max_missing`` ингредиентов.
+        """
+        ids = recipe_ingredient_index.search(
+            include=self.get_ingredient_ids('include'),
+            exclude=self.get_ingredient_ids('exclude'),
+            pantry=self.get_ingredient_ids('pantry'),
+            max_missing=self.get_max_missing(),
+        )
+        return self.serialize_page(self.paginate_queryset(ids))
+
+    @action(
+        detail=True,
+        methods=('get',),
+        pagination_class=None,
+        permission_classes=[AllowAny]
+    )
+    def similar(self, request, pk):
+        """Похожие рецепты из таблицы, посчитанной заранее."""
+        recipe = get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        try:
+            limit = int(request.query_params.get('limit', 0))
+        except ValueError:
+            limit = 0
+        limit = min(limit, settings.SIMILAR_RECIPES_LIMIT) or (
+            settings.SIMILAR_RECIPES_LIMIT)
+        recipes = Recipe.objects.filter(
+            similar_for__recipe=recipe
+        ).order_by('-similar_for__score', '-id')[:limit]
+        serializer = self.get_serializer(recipes, many=True)
+        return Response(serializer.data)
+
     @action(
         detail=False,
         methods=('post', 'delete'),
@@ -93,37 +286,141 @@ class RecipeViewSet(ModelViewSet):
 
     @action(
         detail=False,
-        methods=('post', 'delete'),
+        methods=('post', 'patch', 'delete'),
         url_path=r'(?P<id>[\d]+)/shopping_cart',
         url_name='shopping_cart',
         pagination_class=None,
         permission_classes=[IsAuthenticated]
     )
     def shopping_cart(self, request, id):
+        """POST и PATCH принимают необязательное число порций."""
+        if request.method == 'DELETE':
+            return post_delete_favorite_shopping_cart(
+                request.user, request.method, ShoppingCart, id
+            )
+        serializer = ServingsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        servings = serializer.validated_data['servings']
+        if request.method == 'PATCH':
+            return set_servings(request.user, id, servings)
         return post_delete_favorite_shopping_cart(
-            request.user, request.method, ShoppingCart, id
+            request.user, request.method, ShoppingCart, id,
+            servings=servings
         )
 
+    def bulk_recipes(self, request, model):
+        serializer = RecipeIdsSerializer(
+            data=request.data, partial=request.method == 'DELETE')
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data.get('recipes')
+        if request.method == 'POST':
+            return bulk_add_recipes(request.user, model, ids)
+        return bulk_remove_recipes(request.user, model, ids)
+
     @action(
         detail=False,
-        methods=('get',),
-        url_path='download_shopping_cart',
-        url_name='download_shopping_cart',
+        methods=('post', 'delete'),
+        url_path='favorite',
+        url_name='favorite_bulk',
         pagination_class=None,
         permission_classes=[IsAuthenticated]
     )
-    def download_shopping_cart(self, request):
-        user = request.user
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__carts__user=user
-        ).order_by(
-            'ingredient__name'
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit',
-        ).annotate(sum_amount=Sum('amount'))
-        shopping_cart = recipe_formation(ingredients)
-        filename = 'shopping_cart.txt'
-        response = HttpResponse(shopping_cart, content_type='text/plain')
+    def favorite_bulk(self, request):
+        """Добавляет в избранное или удаляет оттуда список рецептов;
+        DELETE без списка очищает избранное."""
+        return self.bulk_recipes(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=('get', 'post', 'delete'),
+        url_path='shopping_cart',
+        url_name='shopping_cart_bulk',
+        pagination_class=None,
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_bulk(self, request):
+        """GET возвращает список покупок, POST и DELETE работают как
+        для избранного: DELETE без списка очищает корзину."""
+        if request.method == 'GET':
+            serializer = self.get_serializer(
+                CartIngredient.objects.filter(
+                    user=request.user
+                ).select_related('ingredient').order_by('ingredient__name'),
+                many=True
+            )
+            return Response(serializer.data)
+        return self.bulk_recipes(request, ShoppingCart)
+
+
+class MetricsView(APIView):
+    """Метрики запросов процесса в формате Prometheus."""
+    permission_classes = (permissions.IsAdminUser,)
+    renderer_classes = (PrometheusRenderer,)
+    content_negotiation_class = MetricsContentNegotiation
+
+    def get(self, request):
+        return Response(aggregator.render())
+
+
+class ShoppingCartDownloadView(APIView):
+    """Выгрузка списка покупок: проверки DRF и выбор формата.
+
+    Под WSGI файл отдаётся потоком прямо из курсора. Под ASGI он
+    собирается во временный файл: Django 3.2 перебирает потоковые
+    ответы в цикле событий, где ORM недоступен.
+    """
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = SHOPPING_CART_RENDERERS
+
+    def get(self, request):
+        renderer = request.accepted_renderer
+        rows = shopping_list_rows(request.user).iterator()
+        filename = f'shopping_cart.{renderer.format}'
+        if isinstance(request._request, ASGIRequest):
+            return FileResponse(
+                export_to_file(renderer, rows),
+                as_attachment=True,
+                filename=filename,
+                content_type=renderer.get_content_type(),
+            )
+        response = StreamingHttpResponse(
+            renderer.stream(rows),
+            content_type=renderer.get_content_type()
+        )
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
+
+
+shopping_cart_download_view = ShoppingCartDownloadView.as_view()
+
+
+def export_shopping_cart(request):
+    """Выполняет представление DRF в рабочем потоке.
+
+    Поток не связан с обработкой запроса, поэтому соединения с базой
+    проверяются и закрываются так же, как в начале и конце запроса, а
+    ответ с ошибкой рендерится здесь же.
+    """
+    close_old_connections()
+    try:
+        response = shopping_cart_download_view(request)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+async def download_shopping_cart(request):
+    """Выгрузка списка покупок.
+
+    Под ASGI запросы к базе и сборка файла идут в пуле потоков и не
+    занимают ни цикл событий, ни общий поток синхронных представлений.
+    Под WSGI Django вызывает обёртку через ``async_to_sync``, и
+    ``thread_sensitive`` возвращает представление в поток запроса: там
+    же сервер перебирает потоковый ответ.
+    """
+    if isinstance(request, ASGIRequest):
+        return await sync_to_async(
+            export_shopping_cart, thread_sensitive=False)(request)
+    return await sync_to_async(shopping_cart_download_view)(request)
@@ -0,0 +1,10 @@
+import os
+
+from django.core.asgi import get_asgi_application
+
+from foodgram.db import serving_requests
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+serving_requests.set()
+
+application = get_asgi_application()
@@ -0,0 +1,6 @@
+import threading
+
+# Устанавливается в wsgi.py и asgi.py. Только соединения процессов,
+# обслуживающих HTTP-запросы, получают STATEMENT_TIMEOUT: migrate
+# и другие команды manage.py работают без ограничения.
+serving_requests = threading.Event()
@@ -0,0 +1,75 @@
+from django.db.backends.postgresql import base
+
+from foodgram.db import serving_requests
+from foodgram.db.pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL с проверкой постоянных соединений и пулом.
+
+    ``CONN_HEALTH_CHECKS`` повторяет поведение Django 4.1: соединение,
+    оставшееся от прошлого запроса, проверяется перед первым запросом
+    к базе и переоткрывается, если сервер его закрыл. ``POOL`` с ключом
+    ``MAX_SIZE`` включает пул процесса: ``close()`` возвращает
+    соединение в пул вместо закрытия. ``STATEMENT_TIMEOUT``
+    в миллисекундах ограничивает время запроса, но только в процессах,
+    обслуживающих HTTP-запросы.
+    """
+    health_check_done = False
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get('POOL')
+        if not options:
+            return None
+        return get_pool(self.alias, options)
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        timeout = self.settings_dict.get('STATEMENT_TIMEOUT')
+        if timeout and serving_requests.is_set():
+            params['options'] = ' '.join(filter(None, (
+                params.get('options'), f'-c statement_timeout={timeout}'
+            )))
+        return params
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        return pool.acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params)
+        )
+
+    def _close(self):
+        pool = self.pool
+        if pool is None:
+            return super()._close()
+        if self.in_atomic_block:
+            # Обёртка сохранит ссылку до выхода из atomic, поэтому
+            # соединение закрывается, а пул только освобождает место.
+            super()._close()
+        with self.wrap_database_errors:
+            return pool.release(self.connection)
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        enabled = self.settings_dict.get('CONN_HEALTH_CHECKS')
+        if not enabled or self.health_check_done or self.connection is None:
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        if not self.in_atomic_block:
+            self.close_if_health_check_failed()
+        return super()._cursor(name)
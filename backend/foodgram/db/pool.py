@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import Counter
+from queue import Empty, LifoQueue
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+POOL_TIMEOUT_ERROR = 'Нет свободных соединений с базой за {} с'
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Пул соединений psycopg2 одного процесса.
+
+    Не больше ``max_size`` соединений выдано одновременно; остальные
+    потоки ждут до ``timeout`` секунд. Соединения, простоявшие дольше
+    ``check_after`` секунд, перед выдачей проверяются запросом.
+    """
+
+    def __init__(self, max_size, timeout, check_after):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.idle = LifoQueue()
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    def acquire(self, connect):
+        started = time.perf_counter()
+        acquired = self.slots.acquire(timeout=self.timeout)
+        waited = time.perf_counter() - started
+        with self.lock:
+            self.stats['wait_seconds'] += waited
+            self.stats['acquired' if acquired else 'timeouts'] += 1
+            self.stats['in_use'] += acquired
+        if not acquired:
+            raise psycopg2.OperationalError(
+                POOL_TIMEOUT_ERROR.format(self.timeout))
+        try:
+            connection = self.take_idle()
+            if connection is None:
+                connection = connect()
+                with self.lock:
+                    self.stats['created'] += 1
+        except BaseException:
+            self.free_slot()
+            raise
+        return connection
+
+    def take_idle(self):
+        while True:
+            try:
+                connection, released_at = self.idle.get_nowait()
+            except Empty:
+                return None
+            stale = time.monotonic() - released_at > self.check_after
+            if not connection.closed and (not stale or is_alive(connection)):
+                return connection
+            connection.close()
+
+    def release(self, connection):
+        try:
+            if connection.closed:
+                return
+            if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    connection.close()
+                    return
+            self.idle.put((connection, time.monotonic()))
+        finally:
+            self.free_slot()
+
+    def free_slot(self):
+        with self.lock:
+            self.stats['in_use'] -= 1
+        self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                connection, _ = self.idle.get_nowait()
+            except Empty:
+                return
+            connection.close()
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['idle'] = self.idle.qsize()
+        stats['max_size'] = self.max_size
+        return stats
+
+
+def is_alive(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def get_pool(alias, options):
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(
+                max_size=options['MAX_SIZE'],
+                timeout=options.get('TIMEOUT', 10),
+                check_after=options.get('CHECK_AFTER', 30),
+            )
+        return _pools[alias]
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def get_pool_stats():
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.get_stats() for alias, pool in pools.items()}
@@ -0,0 +1,45 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_ALIAS = 'replica'
+
+replica_allowed = ContextVar('replica_allowed', default=False)
+
+
+@contextmanager
+def use_primary():
+    """Выполняет чтения блока на основной базе."""
+    token = replica_allowed.set(False)
+    try:
+        yield
+    finally:
+        replica_allowed.reset(token)
+
+
+class ReplicaRouter:
+    """Направляет чтения моделей из ``DATABASE_REPLICA_APPS`` на реплику.
+
+    Реплика используется только там, где это явно разрешено через
+    ``replica_allowed`` — в безопасных запросах без закрепления за
+    основной базой. Команды, сигналы и фоновые задачи читают с основной
+    базы. Записи и миграции всегда идут на основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not replica_allowed.get():
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label not in settings.DATABASE_REPLICA_APPS:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -19,6 +19,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'django_filters',
     'rest_framework',
     'rest_framework.authtoken',
@@ -27,6 +28,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,19 +59,59 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# foodgram.db расширяет штатный бэкенд PostgreSQL, поэтому окружения со
+# старым значением DB_ENGINE тоже получают пул и проверку соединений.
+POSTGRESQL_ENGINES = (
+    'django.db.backends.postgresql',
+    'django.db.backends.postgresql_psycopg2',
+)
+DB_ENGINE = os.getenv('DB_ENGINE', default='foodgram.db')
+if DB_ENGINE in POSTGRESQL_ENGINES:
+    DB_ENGINE = 'foodgram.db'
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', default=0))
+DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', default=0))
+
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv(
-            'DB_ENGINE', default='django.db.backends.postgresql'
-        ),
+        'ENGINE': DB_ENGINE,
         'NAME': os.getenv('DB_NAME', default='postgres'),
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default=5432)
+        'PORT': os.getenv('DB_PORT', default=5432),
+        'CONN_MAX_AGE': (
+            0 if DB_POOL_MAX_SIZE
+            else int(os.getenv('DB_CONN_MAX_AGE', default=60))
+        ),
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', default='1') == '1'
+        ),
+        'STATEMENT_TIMEOUT': DB_STATEMENT_TIMEOUT,
+        'POOL': {
+            'MAX_SIZE': DB_POOL_MAX_SIZE,
+            'TIMEOUT': int(os.getenv('DB_POOL_TIMEOUT', default=10)),
+        } if DB_POOL_MAX_SIZE else None,
     }
 }
 
+DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST')
+DB_REPLICA_NAME = os.getenv('DB_REPLICA_NAME')
+if DB_REPLICA_HOST or DB_REPLICA_NAME:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': DB_REPLICA_HOST or DATABASES['default']['HOST'],
+        'PORT': os.getenv(
+            'DB_REPLICA_PORT', default=DATABASES['default']['PORT']
+        ),
+        'NAME': DB_REPLICA_NAME or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['foodgram.db.router.ReplicaRouter']
+DATABASE_REPLICA_APPS = ('recipes',)
+DATABASE_REPLICA_PIN_SECONDS = int(
+    os.getenv('DB_REPLICA_PIN_SECONDS', default=5)
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation'
@@ -139,3 +182,55 @@ DJOSER = {
     'HIDE_USERS': False,
     'LOGIN_FIELD': 'email'
 }
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+INGREDIENT_AUTOCOMPLETE_LIMIT = 50
+INGREDIENT_INDEX_TTL = 300
+RECIPE_INGREDIENT_INDEX_TTL = 300
+INDEX_VERSION_CHECK_INTERVAL = 1
+
+TRENDING_WINDOW_DAYS = 7
+TRENDING_HALF_LIFE_HOURS = 48
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.memcached.PyMemcacheCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='memcached:11211'),
+    }
+}
+
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', default=300))
+BULK_RECIPES_LIMIT = 100
+CART_MAX_SERVINGS = 50
+
+IMAGE_PROCESSING_BACKEND = os.getenv(
+    'IMAGE_PROCESSING_BACKEND', default='thread'
+)
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', default=2))
+RECIPE_THUMBNAIL_SIZE = (480, 480)
+RECIPE_IMAGE_WEBP_SIZE = (1280, 1280)
+RECIPE_IMAGE_WEBP_QUALITY = 80
+RECIPE_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 25_000_000
+
+SEARCH_CONFIG = 'russian'
+
+SIMILAR_RECIPES_LIMIT = 10
+
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_BACKFILL_LIMIT = 100
+
+API_METRICS_ENABLED = os.getenv('API_METRICS_ENABLED', default='1') == '1'
+SLOW_REQUEST_THRESHOLD_MS = (
+    int(os.environ['SLOW_REQUEST_THRESHOLD_MS'])
+    if os.getenv('SLOW_REQUEST_THRESHOLD_MS') else None
+)
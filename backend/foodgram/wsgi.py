@@ -2,6 +2,9 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from foodgram.db import serving_requests
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+serving_requests.set()
 
 application = get_wsgi_application()
@@ -2,6 +2,7 @@ from django.contrib import admin
 
 from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                             ShoppingCart, Tag, TagInRecipe)
+from recipes.signals import recipe_ingredients_changed
 
 
 class IngredientRecipeInline(admin.TabularInline):
@@ -63,6 +64,17 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ('name', 'author', 'tags')
 
     def count_favorite(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
 
     count_favorite.short_description = 'Число добавлений в избранное'
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if change and not any(
+            formset.has_changed() for formset in formsets
+            if formset.model is IngredientInRecipe
+        ):
+            return
+        recipe_ingredients_changed.send(
+            sender=Recipe, instance=form.instance,
+            using=form.instance._state.db)
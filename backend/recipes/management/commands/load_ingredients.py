@@ -0,0 +1,15 @@
+import os
+
+from django.conf import settings
+
+from recipes.management.loaders import BaseLoadCommand
+from recipes.models import Ingredient
+
+
+class Command(BaseLoadCommand):
+    help = 'Загружает ингредиенты из CSV или JSON'
+    model = Ingredient
+    fields = ('name', 'measurement_unit')
+    default_path = os.path.join(
+        settings.BASE_DIR, 'data', 'ingredients_1.json'
+    )
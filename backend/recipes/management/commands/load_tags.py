@@ -0,0 +1,13 @@
+import os
+
+from django.conf import settings
+
+from recipes.management.loaders import BaseLoadCommand
+from recipes.models import Tag
+
+
+class Command(BaseLoadCommand):
+    help = 'Загружает теги из CSV или JSON'
+    model = Tag
+    fields = ('name', 'color', 'slug')
+    default_path = os.path.join(settings.BASE_DIR, 'data', 'tags.json')
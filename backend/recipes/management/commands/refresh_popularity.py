@@ -0,0 +1,45 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает популярность рецептов для сортировки trending: '
+        'каждое добавление в избранное или корзину за последние дни '
+        'даёт вклад, убывающий вдвое за TRENDING_HALF_LIFE_HOURS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        since = now - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+        half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+        scores = defaultdict(float)
+        for model in (Favorite, ShoppingCart):
+            for recipe_id, date_added in model.objects.filter(
+                date_added__gte=since
+            ).order_by().values_list('recipe_id', 'date_added').iterator():
+                age = (now - date_added).total_seconds()
+                scores[recipe_id] += 0.5 ** (age / half_life)
+        with transaction.atomic():
+            reset = Recipe.objects.exclude(pk__in=scores).exclude(
+                popularity_score=0
+            ).update(popularity_score=0)
+            Recipe.objects.bulk_update(
+                [Recipe(pk=pk, popularity_score=score)
+                 for pk, score in scores.items()],
+                ('popularity_score',),
+                batch_size=options['batch_size'],
+            )
+        self.stdout.write(
+            f'Обновлено рецептов: {len(scores)}, обнулено: {reset}'
+        )
@@ -0,0 +1,187 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.signals import catalogue_loaded
+
+JSON_READ_SIZE = 64 * 1024
+
+
+def read_csv(file, fields):
+    for row in csv.reader(file):
+        if row:
+            yield dict(zip(fields, row))
+
+
+def read_json(file, fields):
+    """Построчно разбирает JSON-массив, не загружая файл целиком.
+
+    Поддерживает как плоские объекты, так и фикстуры Django
+    с вложенным ключом ``fields``.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        chunk = file.read(JSON_READ_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+                started = started or buffer[position] == '['
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                raise CommandError('Ожидается JSON-массив')
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break
+            position = end
+            item = item.get('fields', item)
+            yield {field: item[field] for field in fields}
+        if not chunk:
+            return
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+class RowsReader:
+    """Файлоподобная обёртка над строками для COPY FROM STDIN."""
+
+    def __init__(self, rows, fields, on_row):
+        self.rows = rows
+        self.fields = fields
+        self.on_row = on_row
+        self.buffer = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.on_row()
+            line = ','.join(
+                '"{}"'.format(str(row[field]).replace('"', '""'))
+                for field in self.fields
+            )
+            self.buffer += line + '\n'
+        if size < 0:
+            size = len(self.buffer)
+        buffer, self.buffer = self.buffer, self.buffer[size:]
+        return buffer[:size]
+
+
+class BaseLoadCommand(BaseCommand):
+    """Потоковая загрузка справочника из CSV или JSON.
+
+    На PostgreSQL строки передаются через ``COPY FROM STDIN`` во
+    временную таблицу и переносятся одним ``INSERT ... ON CONFLICT DO
+    NOTHING``; на остальных СУБД используется ``bulk_create`` пачками.
+    Повторный запуск не создаёт дублей. Оба пути не вызывают
+    ``post_save``, поэтому после загрузки отправляется
+    ``catalogue_loaded``, по которому сбрасываются индексы и кэш API.
+    """
+    model = None
+    fields = ()
+    default_path = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=self.default_path)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY даже на PostgreSQL',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        self.batch_size = options['batch_size']
+        self.processed = 0
+        self.started = time.monotonic()
+        use_copy = (
+            connection.vendor == 'postgresql' and not options['no_copy']
+        )
+        with open(path, encoding='utf-8') as file:
+            rows = reader(file, self.fields)
+            with transaction.atomic():
+                if use_copy:
+                    created = self.copy(rows)
+                else:
+                    created = self.bulk_create(rows)
+        if created:
+            catalogue_loaded.send(sender=self.model, created=created)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {self.processed}, добавлено: {created}, '
+            f'{elapsed:.2f} с ({self.rate(elapsed):.0f} строк/с)'
+        ))
+
+    def rate(self, elapsed):
+        return self.processed / elapsed if elapsed else 0
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'{self.processed} строк, {self.rate(elapsed):.0f} строк/с'
+        )
+
+    def count_row(self):
+        self.processed += 1
+        if self.processed % self.batch_size == 0:
+            self.report()
+
+    def bulk_create(self, rows):
+        before = self.model.objects.count()
+        while True:
+            batch = [
+                self.model(**row) for row in islice(rows, self.batch_size)
+            ]
+            if not batch:
+                break
+            self.model.objects.bulk_create(batch, ignore_conflicts=True)
+            self.processed += len(batch)
+            self.report()
+        return self.model.objects.count() - before
+
+    def copy(self, rows):
+        quote_name = connection.ops.quote_name
+        table = quote_name(self.model._meta.db_table)
+        temporary_table = quote_name('catalogue_load')
+        columns = ', '.join(
+            quote_name(self.model._meta.get_field(field).column)
+            for field in self.fields
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {temporary_table} '
+                f'ON COMMIT DROP AS SELECT {columns} FROM {table} WITH NO DATA'
+            )
+            cursor.cursor.copy_expert(
+                f'COPY {temporary_table} ({columns}) '
+                f'FROM STDIN WITH (FORMAT csv)',
+                RowsReader(rows, self.fields, self.count_row),
+                size=JSON_READ_SIZE,
+            )
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT {columns} FROM {temporary_table} '
+                f'ON CONFLICT DO NOTHING'
+            )
+            return cursor.rowcount
@@ -1,10 +1,16 @@
 from colorfield.fields import ColorField
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import F, Prefetch, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 from users.models import User
 
 COOKING_TIME_ERROR = 'Время приготовление должно быть больше 0'
 AMOUNT_INGREDIENT_ERROR = 'Количество ингредиента должно быть больше 0'
+SERVINGS_ERROR = 'Число порций должно быть больше 0'
 
 
 class Ingredient(models.Model):
@@ -12,6 +18,7 @@ class Ingredient(models.Model):
     name = models.CharField(
         verbose_name='Ингредиент',
         max_length=100,
+        db_index=True,
     )
     measurement_unit = models.CharField(
         verbose_name='Единица измерения',
@@ -22,6 +29,12 @@ class Ingredient(models.Model):
         ordering = ['name']
         verbose_name = 'Ингредиент',
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -55,6 +68,38 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Планирование запросов для чтения списка и карточки рецептов."""
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient_recipes',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
+
+    def latest_by_author(self, limit):
+        """Не больше ``limit`` последних рецептов каждого автора.
+
+        Django 3.2 не умеет фильтровать по оконным функциям, поэтому
+        нумерация ROW_NUMBER() оборачивается в подзапрос.
+        """
+        ranked = self.annotate(author_rank=Window(
+            expression=RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('pub_date').desc(), F('id').desc()),
+        )).order_by().values('id', 'author_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(id__in=RawSQL(
+            f'SELECT id FROM ({sql}) AS ranked WHERE author_rank <= %s',
+            (*params, limit)
+        ))
+
+
 class Recipe(models.Model):
     """Модель для рецептов."""
     name = models.CharField(
@@ -77,6 +122,18 @@ class Recipe(models.Model):
         verbose_name='Изображение блюда',
         upload_to='recipes/image/'
     )
+    thumbnail = models.ImageField(
+        verbose_name='Миниатюра изображения',
+        upload_to='recipes/thumbnails/',
+        blank=True,
+        editable=False,
+    )
+    image_webp = models.ImageField(
+        verbose_name='Изображение в формате WebP',
+        upload_to='recipes/webp/',
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         verbose_name='Описание блюда',
         help_text='Заполните описание рецепта',
@@ -99,11 +156,55 @@ class Recipe(models.Model):
         through='IngredientInRecipe',
         related_name='recipes'
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Число добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    carts_count = models.PositiveIntegerField(
+        verbose_name='Число добавлений в корзину',
+        default=0,
+        editable=False,
+    )
+    popularity_score = models.FloatField(
+        verbose_name='Популярность за последние дни',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_feed_idx'
+            ),
+            models.Index(
+                fields=('-favorites_count', '-pub_date'),
+                name='recipe_popular_idx'
+            ),
+            models.Index(
+                fields=('-popularity_score', '-pub_date'),
+                name='recipe_trending_idx'
+            ),
+            models.Index(
+                fields=('cooking_time', '-pub_date'),
+                name='recipe_cooking_time_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_feed_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -123,9 +224,15 @@ class ShoppingCart(models.Model):
         verbose_name='Рецепт',
         related_name='carts',
     )
+    servings = models.PositiveSmallIntegerField(
+        verbose_name='Число порций',
+        default=1,
+        validators=(MinValueValidator(1, SERVINGS_ERROR),),
+    )
     date_added = models.DateTimeField(
         verbose_name='Дата добавления',
         auto_now_add=True,
+        db_index=True,
     )
 
     class Meta:
@@ -141,6 +248,43 @@ class ShoppingCart(models.Model):
         return f'{self.user} {self.recipe}'
 
 
+class CartIngredient(models.Model):
+    """Модель для суммы ингредиентов в корзине пользователя.
+
+    Обновляется при изменении корзины, чтобы список покупок читался
+    без группировки по рецептам.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='cart_ingredients',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+        related_name='cart_ingredients',
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество ингредиента',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент в корзине'
+        verbose_name_plural = 'Ингредиенты в корзине'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_cart_ingredient'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.ingredient}'
+
+
 class IngredientInRecipe(models.Model):
     """Модель для хранения количества ингредиентов."""
     recipe = models.ForeignKey(
@@ -218,6 +362,11 @@ class Favorite(models.Model):
         null=False,
         blank=False,
     )
+    date_added = models.DateTimeField(
+        verbose_name='Дата добавления',
+        default=timezone.now,
+        db_index=True,
+    )
 
     class Meta:
         ordering = ['user']
@@ -230,3 +379,83 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f'Рецепт {self.recipe} добавлен в избранное {self.user}'
+
+
+class SimilarRecipe(models.Model):
+    """Модель для похожих рецептов, посчитанных заранее."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='similar_entries',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Похожий рецепт',
+        related_name='similar_for',
+    )
+    score = models.FloatField(
+        verbose_name='Сходство',
+    )
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similar_recipe_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} ~ {self.similar}'
+
+
+class TimelineEntry(models.Model):
+    """Модель для ленты рецептов авторов, на которых подписан пользователь.
+
+    Дата публикации продублирована из рецепта, чтобы страница ленты
+    читалась по одному индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='timeline',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='timeline_user_feed_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.recipe}'
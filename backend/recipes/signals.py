@@ -0,0 +1,11 @@
+from django.dispatch import Signal
+
+# Отправляется командами загрузки справочников, которые пишут в базу
+# через COPY или bulk_create без post_save. sender — модель справочника,
+# created — число добавленных строк.
+catalogue_loaded = Signal()
+
+# Отправляется, когда состав ингредиентов рецепта меняется массовыми
+# запросами без сигналов строк: сериализатором API и админкой. sender —
+# модель Recipe, instance — рецепт, using — алиас базы.
+recipe_ingredients_changed = Signal()
@@ -5,7 +5,8 @@ from users.models import Follower, User
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('email', 'username', 'id')
+    list_display = ('email', 'username', 'id',
+                    'recipes_count', 'followers_count')
     search_fields = ('username', 'email')
     empty_value_display = '-пусто-'
     list_filter = ('email', 'username')
@@ -40,6 +40,16 @@ class User(AbstractUser):
         choices=ROLES,
         default=USER
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Число рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Число подписчиков',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         ordering = ['pk']